@@ -1,37 +1,368 @@
 # Import required libraries
 
+import base64
+import bisect
+import contextlib
+import csv
 import datetime as dt
+import functools
+import gzip
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+import numpy as np
 import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
 import dash
-import dash_table
-from dash.dependencies import Input, Output, State
-import dash_core_components as dcc
-import dash_html_components as html
+import flask
+from dash import dash_table, dcc, html
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objs as go
+import plotly.utils
+
+logger = logging.getLogger(__name__)
+
+# Day Of Week options
+weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Operator dropdown value standing for every operator, so that neither the
+# layout nor the callback inputs carry the whole list (also in scripts.js)
+ALL_OPERATORS = '__all__'
 
 # Load data
 
 #for local use
-#df = pd.read_csv('data/data-plane.csv', sep='\t', header = None, error_bad_lines=False)
+#DATA_PATH = 'data/data-plane.csv'
 
 #for VM use 
-df = pd.read_csv('/var/lib/jenkins/workspace/Microservice_Analyse/src/app/out/data-plane.csv', sep='\t', header = None, error_bad_lines=False)
+# Either one file or a folder of partitions of the data (e.g. one file per
+# year or month), the last one in name order being the file that grows
+DATA_PATH = os.environ.get('DATA_PLANE_PATH', '/var/lib/jenkins/workspace/Microservice_Analyse/src/app/out/data-plane.csv')
+
+# Seconds between two checks of the data file for appended flights (0 disables it)
+INGEST_POLL_INTERVAL = int(os.environ.get('INGEST_POLL_INTERVAL', 10))
+
+def clean_data(df):
+    # Some cleaning and edit on the dataset 
+    df = df.drop(df.columns[[0]], axis=1)
+    df.columns = ['Date','Hour','Manufacturer','Model','Operator','NumberFlights']
+
+    # Rows whose date cannot be read are dropped
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    if df['Date'].isna().any():
+        df = df[df['Date'].notna()].reset_index(drop=True)
+    df['DayOfWeek']=df['Date'].dt.day_name()
+    # ISO week, which belongs to the year of its Thursday: the first days of
+    # January can be in the last week of the previous year and the last days
+    # of December in the first week of the next one
+    iso = df['Date'].dt.isocalendar()
+    df['WeekNumber'] = iso.week
+    df['Hour'] = pd.to_numeric(df['Hour'], errors = 'coerce')
+    df['Year'] = df['Date'].dt.year
+    df['ISOYear'] = iso.year
+    df['Month'] = df['Date'].dt.month_name()
+    return compact_dtypes(df)
+
+# Compact representation of the cleaned frame: the string columns are
+# dictionary encoded as categoricals and the integers use the smallest type
+# that fits, bad hours being missing values of a nullable Int8 column.
+CATEGORY_DTYPES = {
+    'Manufacturer': 'category',
+    'Model': 'category',
+    'Operator': 'category',
+    'DayOfWeek': CategoricalDtype(weekdays),
+    'Month': CategoricalDtype(["January", "February", "March", "April", "May", "June", "July",
+                               "August", "September", "October", "November", "December"]),
+}
+
+def compact_dtypes(df):
+    for col, dtype in CATEGORY_DTYPES.items():
+        df[col] = df[col].astype(dtype)
+    hour = df['Hour']
+    df['Hour'] = hour.where((hour >= 0) & (hour <= 23) & (hour % 1 == 0)).astype('Int8')
+    df['WeekNumber'] = df['WeekNumber'].astype(np.int8)
+    df['Year'] = df['Year'].astype(np.int16)
+    df['ISOYear'] = df['ISOYear'].astype(np.int16)
+    return df
+
+def concat_frames(frames):
+    # Align the categories first, so that the columns stay categoricals. The
+    # columns with a declared dtype already share it, and keep its order.
+    frames = list(frames)
+    for col, dtype in CATEGORY_DTYPES.items():
+        if isinstance(dtype, CategoricalDtype):
+            continue
+        categories = union_categoricals([f[col] for f in frames], sort_categories=True).categories
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def memory_report(df):
+    """Bytes per column of ``df`` and of the same frame with the loose dtypes of pandas' defaults."""
+    loose = df.copy()
+    for col in CATEGORY_DTYPES:
+        loose[col] = loose[col].astype(object)
+    loose['Hour'] = loose['Hour'].astype('float64')
+    loose['WeekNumber'] = loose['WeekNumber'].astype(np.int64)
+    loose['Year'] = loose['Year'].astype(np.int64)
+    loose['ISOYear'] = loose['ISOYear'].astype(np.int64)
+    report = pd.DataFrame({
+        'before': loose.memory_usage(index=False, deep=True),
+        'after': df.memory_usage(index=False, deep=True),
+    })
+    report.loc['Total'] = report.sum()
+    report['before per row'] = (report['before'] / max(len(df), 1)).round(2)
+    report['after per row'] = (report['after'] / max(len(df), 1)).round(2)
+    return report
+
+# The file is parsed in chunks of about PARSE_CHUNK_MB megabytes, cut on
+# line ends, by PARSE_WORKERS processes (0 for one per core)
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 0)) or os.cpu_count() or 1
+PARSE_CHUNK_BYTES = int(os.environ.get('PARSE_CHUNK_MB', 32)) * 2**20
+
+# Fields of a line: an id, then the columns named in clean_data
+LINE_FIELDS = 7
+
+# Lines rejected since the start, by reason
+rejected_lines = Counter()
+
+def check_lines(chunk):
+    """Drop the lines of ``chunk`` without the expected number of fields.
+
+    Returns the lines kept and the number of lines rejected by reason. Empty
+    lines are skipped without being counted, as read_csv does.
+    """
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    tabs = np.flatnonzero(data == ord('\t'))
+    fields = np.searchsorted(tabs, ends) - np.searchsorted(tabs, starts) + 1
+    bad = (fields != LINE_FIELDS) & (ends > starts)
+    if not bad.any():
+        return chunk, Counter()
+    rejected = Counter({'too many fields': int((bad & (fields > LINE_FIELDS)).sum()),
+                        'too few fields': int((bad & (fields < LINE_FIELDS)).sum())})
+    keep = np.repeat(~bad, ends - starts + 1)
+    return data[keep].tobytes(), +rejected
+
+def parse_chunk(path, start, end):
+    """Parse and clean the bytes ``start:end`` of ``path``, which hold complete lines."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        chunk, rejected = check_lines(f.read(end - start))
+    if not chunk.strip():
+        return None, rejected
+    # No quoting, so that a line is always the fields counted above
+    df = pd.read_csv(io.BytesIO(chunk), sep='\t', header=None, quoting=csv.QUOTE_NONE,
+                     dtype={3: str, 4: str, 5: str})
+    rows = clean_data(df)
+    if len(rows) < len(df):
+        rejected['bad date'] += len(df) - len(rows)
+    return rows, rejected
+
+def parse_worker(conn, path, chunks):
+    try:
+        conn.send([parse_chunk(path, start, end) for start, end in chunks])
+    except Exception as e:
+        conn.send(e)
+    conn.close()
+
+def parse_chunks(path, chunks, workers):
+    """parse_chunk on each chunk, spread over ``workers`` forked processes.
 
-# Some cleaning and edit on the dataset 
-df = df.drop(df.columns[[0]], axis=1)
-df.columns = ['Date','Hour','Manufacturer','Model','Operator','NumberFlights']
+    The processes are forked rather than given pickled tasks, as the data is
+    first read while the app module is still being imported.
+    """
+    context = multiprocessing.get_context('fork')
+    processes = []
+    for i in range(workers):
+        receive, send = context.Pipe(duplex=False)
+        process = context.Process(target=parse_worker, args=(send, path, chunks[i::workers]))
+        process.start()
+        send.close()
+        processes.append((process, receive))
+    results = [None] * len(chunks)
+    for i, (process, receive) in enumerate(processes):
+        value = receive.recv()
+        process.join()
+        if isinstance(value, Exception):
+            raise value
+        results[i::workers] = value
+    return results
 
-df['Date'] = pd.to_datetime(df['Date'])
-df['DayOfWeek']=df['Date'].dt.day_name()
-df['WeekNumber']=df['Date'].dt.week
-df['Hour'] = pd.to_numeric(df['Hour'], errors = 'coerce')
-df['Year'] = df['Date'].dt.year
-df['Month'] = df['Date'].dt.month_name()
+def chunk_bounds(path, offset):
+    # Offsets from ``offset`` to the end of the last complete line, about
+    # PARSE_CHUNK_BYTES apart and each one at the start of a line
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > offset:
+            start = max(offset, end - 2**16)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        bounds = [offset]
+        while bounds[-1] + PARSE_CHUNK_BYTES < end:
+            f.seek(bounds[-1] + PARSE_CHUNK_BYTES)
+            cut = f.tell() + len(f.readline())
+            if cut >= end:
+                break
+            bounds.append(cut)
+    return bounds + [end] if end > offset else [offset]
 
-# Range of the calendar
-start_date = min(df['Date'])
-end_date = max(df['Date']) 
+def read_data(path, offset=0):
+    """Parse and clean the complete lines of ``path`` found after ``offset``.
+
+    Returns the rows (None if there is no complete line yet) and the offset
+    of the first byte not parsed, so that a line still being written by the
+    pipeline is picked up by the next read. Lines that cannot be parsed are
+    dropped and counted in ``rejected_lines``.
+    """
+    bounds = chunk_bounds(path, offset)
+    if len(bounds) == 1:
+        return None, offset
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+    if len(chunks) > 1 and PARSE_WORKERS > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        results = parse_chunks(path, chunks, min(PARSE_WORKERS, len(chunks)))
+    else:
+        results = [parse_chunk(path, start, end) for start, end in chunks]
+
+    rejected = sum((counts for _, counts in results), Counter())
+    if rejected:
+        rejected_lines.update(rejected)
+        logger.warning('%s: %d lines rejected (%s)', path, sum(rejected.values()),
+                       ', '.join('%d %s' % (n, reason) for reason, n in sorted(rejected.items())))
+    frames = [rows for rows, _ in results if rows is not None]
+    if not frames:
+        return None, bounds[-1]
+    return concat_frames(frames) if len(frames) > 1 else frames[0], bounds[-1]
+
+def source_files(path):
+    # The data file itself, or the partitions of a data folder in name order
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if not name.startswith('.') and os.path.isfile(os.path.join(path, name))]
+    return [path]
+
+def read_sources(path):
+    """Parse every data file of ``path``.
+
+    Returns the rows, the offset reached in the last file, which is the one
+    followed for appended flights, and the list of files.
+    """
+    files = source_files(path)
+    frames = []
+    offset = 0
+    for name in files:
+        rows, offset = read_data(name)
+        if rows is not None:
+            frames.append(rows)
+    return concat_frames(frames), offset, files
+
+# Columnar store of the cleaned dataset. The frame columns, the filter index
+# and the aggregation cube are written once as .npy files and every worker
+# maps them read-only, so they are shared through the page cache instead of
+# being copied in each process, and a restart does not parse the file again.
+# A store is keyed on the size and modification time of the data files.
+
+#Folder of the store, empty to keep everything in the memory of each worker
+DATA_CACHE_DIR = os.environ.get('DATA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+# Stores of older versions of the files are kept that long once a newer one
+# is written, for the workers and requests still reading them
+STORE_GRACE_SECONDS = int(os.environ.get('STORE_GRACE_SECONDS', 600))
+
+# Bumped when the layout of the store changes, so that older stores are rebuilt
+STORE_FORMAT = 4
+
+def store_prefix(path):
+    return os.path.basename(os.path.normpath(path)) + '-'
+
+def cache_folder(path):
+    files = source_files(path)
+    stats = [os.stat(name) for name in files]
+    if files == [path]:
+        key = '%d-%d' % (stats[0].st_size, stats[0].st_mtime_ns)
+    else:
+        key = hashlib.sha1(repr([(name, stat.st_size, stat.st_mtime_ns)
+                                 for name, stat in zip(files, stats)]).encode()).hexdigest()[:16]
+    name = '%s%s-v%d' % (store_prefix(path), key, STORE_FORMAT)
+    return os.path.join(DATA_CACHE_DIR, name), stats[-1].st_size if stats else 0
+
+def save_arrays(folder, prefix, arrays):
+    for name, values in arrays.items():
+        np.save(os.path.join(folder, '%s.%s.npy' % (prefix, name)), values)
+
+def link_arrays(source, folder, prefix, names):
+    # Hard links to the arrays saved in another store, copies where links fail
+    for name in names:
+        path = '%s.%s.npy' % (prefix, name)
+        try:
+            os.link(os.path.join(source, path), os.path.join(folder, path))
+        except OSError:
+            shutil.copyfile(os.path.join(source, path), os.path.join(folder, path))
+
+def map_arrays(folder, prefix, names):
+    return {name: np.load(os.path.join(folder, '%s.%s.npy' % (prefix, name)), mmap_mode='r')
+            for name in names}
+
+def encode_frame(df):
+    # Categoricals are stored as their codes (-1 being a missing value) and
+    # nullable integers as their values plus a mask
+    arrays = {}
+    dtypes = {}
+    for name in df.columns:
+        col = df[name]
+        if col.dtype == object:
+            col = col.astype('category')
+        if isinstance(col.dtype, CategoricalDtype):
+            arrays[name] = col.cat.codes.values
+            dtypes[name] = {'categories': col.cat.categories.tolist()}
+        elif pd.api.types.is_extension_array_dtype(col.dtype):
+            arrays[name] = col.fillna(0).to_numpy(col.dtype.numpy_dtype)
+            arrays[name + '.mask'] = col.isna().values
+            dtypes[name] = {'dtype': str(col.dtype)}
+        else:
+            arrays[name] = col.values
+    return arrays, dtypes
+
+def decode_frame(arrays, dtypes):
+    columns = {}
+    for name, values in arrays.items():
+        info = dtypes.get(name)
+        if name.endswith('.mask'):
+            continue
+        if info is None:
+            columns[name] = values
+        elif 'categories' in info:
+            columns[name] = pd.Categorical.from_codes(values, info['categories'])
+        else:
+            columns[name] = pd.arrays.IntegerArray(np.array(values), np.array(arrays[name + '.mask']))
+    return pd.DataFrame(columns)
 
 # First french lockdown date
 start_lockdown_1 = dt.datetime(2020,3,17)
@@ -41,453 +372,1750 @@ end_lockdown_1 = dt.datetime(2020,5,11)
 start_lockdown_2 = dt.datetime(2020,10,30)
 end_lockdown_2 =dt.datetime(2020,12,15)
 
-# Operator option 
-operator_options = df.Operator.unique()
+# Index used by filter_dataframe
 
-#Manufacturer options
-Manufacturer_options = df.Manufacturer.unique()
+NS_PER_DAY = 86400 * 10**9
+MS_PER_DAY = 86400 * 1000
+MS_PER_HOUR = 3600 * 1000
 
-# Day Of Week options
-weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+def day_number(date):
+    # Days since epoch as int64, for a Timestamp or a datetime Series
+    if isinstance(date, pd.Series):
+        return date.values.astype('datetime64[D]').astype(np.int64)
+    return pd.Timestamp(date).value // NS_PER_DAY
+
+def date_slice(days, start_date, end_date):
+    # Positions in the sorted day numbers ``days`` of the days from
+    # start_date to end_date, both included
+    start = -(-pd.Timestamp(start_date).value // NS_PER_DAY)
+    end = day_number(end_date)
+    return (np.searchsorted(days, start, side='left'),
+            np.searchsorted(days, end, side='right'))
+
+# Named periods highlighted on the figures, the french lockdowns by default.
+# Others can be given in a JSON file (PERIODS_PATH) as a list of
+# {"name": ..., "start": "YYYY-MM-DD", "end": "YYYY-MM-DD", "color": ...},
+# both ends included. A date in several periods belongs to the first one.
+PERIODS_PATH = os.environ.get('PERIODS_PATH')
+
+DEFAULT_PERIODS = [
+    {'name': '1st lockdown', 'start': start_lockdown_1, 'end': end_lockdown_1, 'color': 'crimson'},
+    {'name': '2nd lockdown', 'start': start_lockdown_2, 'end': end_lockdown_2, 'color': 'darkorange'},
+]
+
+def load_periods(path):
+    if not path:
+        periods = DEFAULT_PERIODS
+    else:
+        with open(path) as f:
+            periods = json.load(f)
+    colors = px.colors.qualitative.Plotly
+    return [{'name': period['name'],
+             'start': pd.Timestamp(period['start']),
+             'end': pd.Timestamp(period['end']),
+             'color': period.get('color', colors[i % len(colors)])}
+            for i, period in enumerate(periods)]
+
+PERIODS = load_periods(PERIODS_PATH)
+
+def period_codes(days):
+    # Period of each day number: 0 outside of any period, else 1 + its position in PERIODS
+    codes = np.zeros(len(days), dtype=np.int8)
+    for code in range(len(PERIODS), 0, -1):
+        period = PERIODS[code - 1]
+        codes[(days >= day_number(period['start'])) & (days <= day_number(period['end']))] = code
+    return codes
+
+class FilterIndex:
+    """Categorical codes and date positions of a date-sorted frame.
+
+    Operator, Manufacturer, Model and DayOfWeek are stored as integer codes
+    along with the sorted row positions of each value, and Date as a sorted
+    int64 day column, so that a filter is a binary-search slice on the dates
+    followed by a lookup on the codes.
+    """
+
+    columns = ['Operator', 'Manufacturer', 'Model', 'DayOfWeek']
+
+    def __init__(self, arrays, categories):
+        self.arrays = arrays
+        self.day = arrays['day']
+        self.categories = {}
+        self.codes = {}
+        self.positions = {}
+        for col in self.columns:
+            self.categories[col] = pd.Index(categories[col], dtype=object)
+            self.codes[col] = arrays[col + '.codes']
+            self.positions[col] = np.split(arrays[col + '.order'], arrays[col + '.bounds'])[1:]
+
+    @classmethod
+    def build(cls, df, categories=None):
+        # Codes of the given categories, else of the values found in df
+        arrays = {'day': day_number(df['Date'])}
+        found = {}
+        for col in cls.columns:
+            if categories is not None:
+                cat = pd.Categorical(df[col], categories=categories[col])
+            else:
+                cat = pd.Categorical(df[col], categories=weekdays if col == 'DayOfWeek' else None)
+            codes = cat.codes.astype(np.int32)
+            order = np.argsort(codes, kind='mergesort')
+            arrays[col + '.codes'] = codes
+            arrays[col + '.order'] = order
+            arrays[col + '.bounds'] = np.searchsorted(codes[order], np.arange(len(cat.categories) + 1))
+            found[col] = cat.categories.tolist()
+        return cls(arrays, found)
+
+    def extend(self, tail):
+        """Index of these rows followed by the rows of ``tail``.
+
+        ``tail`` must be built with the same categories and start on the last
+        day or later. The positions of each value stay sorted without sorting
+        again: the old ones keep their order and the new ones follow them.
+        """
+        n, m = len(self.day), len(tail.day)
+        arrays = {'day': np.concatenate([self.day, tail.day])}
+        for col in self.columns:
+            # Start of each block of positions, the missing values (-1) first
+            old = np.concatenate([[0], self.arrays[col + '.bounds']])
+            new = np.concatenate([[0], tail.arrays[col + '.bounds']])
+            order = np.empty(n + m, dtype=np.intp)
+            order[np.arange(n) + np.repeat(new[:-1], np.diff(old))] = self.arrays[col + '.order']
+            order[np.arange(m) + np.repeat(old[1:], np.diff(new))] = tail.arrays[col + '.order'] + n
+            arrays[col + '.codes'] = np.concatenate([self.codes[col], tail.codes[col]])
+            arrays[col + '.order'] = order
+            arrays[col + '.bounds'] = (old + new)[1:]
+        return FilterIndex(arrays, self.categories)
+
+    def lookup(self, col, values):
+        # Boolean table indexed by code, the extra last slot catches missing values (-1)
+        categories = self.categories[col]
+        wanted = np.zeros(len(categories) + 1, dtype=bool)
+        if col == 'Operator' and ALL_OPERATORS in (values or []):
+            wanted[:] = True
+            return wanted
+        codes = categories.get_indexer(pd.Index(list(values or []), dtype=object))
+        wanted[codes[codes >= 0]] = True
+        if wanted[:-1].all():
+            wanted[-1] = True
+        return wanted
+
+    def select(self, operators, dayofweek, start_date, end_date):
+        """Return the positions of the selected rows, as a slice when possible."""
+        lo, hi = date_slice(self.day, start_date, end_date)
+        tables = [(col, self.lookup(col, values))
+                  for col, values in (('Operator', operators), ('DayOfWeek', dayofweek))]
+        # Columns where every value is selected cost nothing
+        tables = [(col, wanted) for col, wanted in tables if not wanted.all()]
+        if not tables:
+            return slice(lo, hi)
+
+        col, wanted = tables[0]
+        selected = np.flatnonzero(wanted[:-1])
+        lists = self.positions[col]
+        if sum(len(lists[c]) for c in selected) * 8 < hi - lo:
+            # Few matching rows: gather the position lists inside the date slice
+            parts = [lists[c][(lists[c] >= lo) & (lists[c] < hi)] for c in selected]
+            rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+        else:
+            rows = lo + np.flatnonzero(wanted[self.codes[col][lo:hi]])
+        for col, wanted in tables[1:]:
+            rows = rows[wanted[self.codes[col][rows]]]
+        return rows
+
+# Aggregation cube used by the figures
+
+def category_codes(codes, size):
+    # Move missing values (-1) to an extra last slot
+    return np.where(codes < 0, size, codes)
+
+def fleet_table(date, operator, manufacturer, model, weights, index):
+    # Flights summed by (date, operator, manufacturer, model), sorted by date
+    n_op = len(index.categories['Operator']) + 1
+    n_man = len(index.categories['Manufacturer']) + 1
+    n_mod = len(index.categories['Model']) + 1
+    key = ((date.astype(np.int64) * n_op + operator) * n_man + manufacturer) * n_mod + model
+    key, inverse = np.unique(key, return_inverse=True)
+    arrays = {'fleet_flights': np.bincount(inverse, weights=weights)}
+    key, arrays['fleet_model'] = np.divmod(key, n_mod)
+    key, arrays['fleet_manufacturer'] = np.divmod(key, n_man)
+    arrays['fleet_date'], arrays['fleet_operator'] = np.divmod(key, n_op)
+    return arrays
+
+def month_bounds(days):
+    # First date of each month, then the end
+    months = days.astype('datetime64[D]').astype('datetime64[M]')
+    return np.concatenate([[0], np.flatnonzero(months[1:] != months[:-1]) + 1, [len(days)]])
+
+def split_partitions(arrays, bounds, fleet_bounds):
+    # Slices of the whole partition arrays, one dict per month
+    return [{name: arrays[name][fleet_bounds[p]:fleet_bounds[p + 1]] if name.startswith('fleet_')
+             else arrays[name][bounds[p]:bounds[p + 1]]
+             for name in FlightCube.partition_arrays}
+            for p in range(len(bounds) - 1)]
+
+class FlightCube:
+    """NumberFlights pre-aggregated when the data is loaded.
+
+    ``flights[d, o, h]`` holds the flights of operator ``o`` on date ``d`` at
+    hour ``h`` and ``rows[d, o, h]`` the number of raw rows behind it, the last
+    hour slot collecting the rows without a valid hour.  The operator table
+    is answered from the flights summed by (date, operator, manufacturer,
+    model), kept in coordinate form and sorted by date.
+
+    The arrays indexed by date are split into one partition per month, the
+    dates, operators and other per-day arrays being loaded eagerly. A cube
+    mapped from the store only maps a partition when a selection first reads
+    its dates, and the partitions mapped are kept in an LRU bounded in bytes,
+    so that many years of traffic can stay online.
+    """
+
+    arrays = ['days', 'year', 'isoyear', 'week', 'dayofweek', 'hours', 'bounds', 'fleet_bounds']
+    partition_arrays = ['flights', 'rows', 'fleet_date', 'fleet_operator', 'fleet_manufacturer',
+                        'fleet_model', 'fleet_flights']
+
+    def __init__(self, index, arrays, folder=None, parts=None):
+        self.index = index
+        for name in self.arrays:
+            setattr(self, name, arrays[name])
+        # Where each partition comes from: the store it is mapped from, or
+        # its arrays, slices of the whole arrays for a cube built in memory
+        if parts is None and folder is not None:
+            parts = [folder] * (len(self.bounds) - 1)
+        elif parts is None:
+            parts = split_partitions(arrays, self.bounds, self.fleet_bounds)
+        self.parts = parts
+        self.dates = pd.DatetimeIndex(np.asarray(self.days).astype('datetime64[D]'))
+        # Monday of each date, the key of the weekly totals of total_graph
+        self.week_start = np.asarray(self.days) - self.dayofweek
+        # Computed when loaded rather than stored, so that it follows the configuration
+        self.period = period_codes(np.asarray(self.days))
+        self.operators = index.categories['Operator']
+        self.manufacturers = index.categories['Manufacturer']
+        self.models = index.categories['Model']
+
+    @classmethod
+    def build(cls, df, index):
+        return cls(index, cls.aggregate(df, index))
+
+    @staticmethod
+    def aggregate(df, index, hours=None):
+        # Whole arrays of the rows of df, over the given hours or the ones found
+        arrays = {}
+        days, first, date_code = np.unique(index.day, return_index=True, return_inverse=True)
+        arrays['days'] = days
+        arrays['year'] = df['Year'].values[first]
+        arrays['isoyear'] = df['ISOYear'].values[first]
+        arrays['week'] = df['WeekNumber'].values[first]
+        arrays['dayofweek'] = index.codes['DayOfWeek'][first]
+
+        hour = df['Hour'].to_numpy('float64', na_value=np.nan)
+        valid = ~np.isnan(hour)
+        if hours is None:
+            hours = np.unique(hour[valid])
+        arrays['hours'] = hours
+        hour_code = np.where(valid, np.searchsorted(hours, hour), len(hours))
+
+        n_op = len(index.categories['Operator']) + 1
+        n_hour = len(hours) + 1
+        shape = (len(days), n_op, n_hour)
+        op_code = category_codes(index.codes['Operator'], n_op - 1)
+        cell = (date_code * n_op + op_code) * n_hour + hour_code
+        weights = df['NumberFlights'].values
+        flights = np.bincount(cell, weights=weights, minlength=np.prod(shape)).reshape(shape)
+        if np.issubdtype(weights.dtype, np.integer):
+            flights = flights.astype(np.int64)
+        arrays['flights'] = flights
+        arrays['rows'] = np.bincount(cell, minlength=np.prod(shape)).reshape(shape).astype(np.int32)
+
+        arrays.update(fleet_table(
+            date_code, op_code,
+            category_codes(index.codes['Manufacturer'], len(index.categories['Manufacturer'])),
+            category_codes(index.codes['Model'], len(index.categories['Model'])),
+            weights, index))
+        arrays['bounds'] = month_bounds(days)
+        arrays['fleet_bounds'] = np.searchsorted(arrays['fleet_date'], arrays['bounds'])
+        return arrays
+
+    def extend(self, df, tail, index):
+        """Cube of these dates followed by the rows of ``df``, indexed by ``tail``.
+
+        The rows start on the last date or later, with known operators and
+        hours. Only the last month and the new ones are aggregated again, the
+        other partitions are shared with this cube.
+        """
+        arrays = self.aggregate(df, tail, self.hours)
+        # The rows of the last date add to its flights
+        overlap = int(arrays['days'][0] == self.days[-1])
+        shift = len(self.days) - overlap
+        last = len(self.bounds) - 2
+        start = self.bounds[last]
+        part = self.partition(last)
+
+        region = {}
+        for name in ('flights', 'rows'):
+            values = np.concatenate([part[name], arrays[name][overlap:]])
+            if overlap:
+                values[len(part[name]) - 1] += arrays[name][0]
+            region[name] = values
+        region.update(fleet_table(
+            np.concatenate([part['fleet_date'], arrays['fleet_date'] + shift]),
+            *[np.concatenate([part[name], arrays[name]])
+              for name in ('fleet_operator', 'fleet_manufacturer', 'fleet_model', 'fleet_flights')],
+            index))
+
+        whole = {name: np.concatenate([getattr(self, name), arrays[name][overlap:]])
+                 for name in ('days', 'year', 'isoyear', 'week', 'dayofweek')}
+        whole['hours'] = self.hours
+        bounds = start + month_bounds(whole['days'][start:])
+        fleet_bounds = np.searchsorted(region['fleet_date'], bounds)
+        whole['bounds'] = np.concatenate([self.bounds[:last], bounds])
+        whole['fleet_bounds'] = np.concatenate([self.fleet_bounds[:last], self.fleet_bounds[last] + fleet_bounds])
+        parts = list(self.parts[:last]) + split_partitions(region, bounds - start, fleet_bounds)
+        return FlightCube(index, whole, parts=parts)
+
+    def partition(self, p):
+        """Arrays of the dates of partition ``p``."""
+        part = self.parts[p]
+        if isinstance(part, dict):
+            return part
+        return partition_cache.get((part, p), lambda: map_arrays(
+            part, 'cube-%d' % p, self.partition_arrays))
+
+    def pieces(self, lo, hi):
+        """Arrays of the dates ``lo:hi`` in each partition they fall in.
+
+        Yields the position of the first date of each piece and its arrays,
+        at least one piece even for an empty range. Fleet dates stay
+        positions in the whole calendar.
+        """
+        bounds = self.bounds
+        first = min(max(np.searchsorted(bounds, lo, side='right') - 1, 0), len(bounds) - 2)
+        last = max(np.searchsorted(bounds, hi, side='left'), first + 1)
+        for p in range(first, last):
+            part = self.partition(p)
+            start = bounds[p]
+            a, b = max(lo - start, 0), max(min(hi, bounds[p + 1]) - start, 0)
+            f_lo, f_hi = np.searchsorted(part['fleet_date'], [lo, hi])
+            yield start + a, {name: values[f_lo:f_hi] if name.startswith('fleet_') else values[a:b]
+                              for name, values in part.items()}
+
+class Selection:
+    """Aggregates of the cube for one filter state, shared by the callbacks."""
+
+    def __init__(self, cube, operators, dayofweek, start_date, end_date):
+        self.cube = cube
+        self._operator_table = None
+        self._series = {}
+        with phase('filter'):
+            lo, hi = date_slice(cube.days, start_date, end_date)
+            day_wanted = cube.index.lookup('DayOfWeek', dayofweek)
+            op_wanted = cube.index.lookup('Operator', operators)
+            dates = lo + np.flatnonzero(day_wanted[cube.dayofweek[lo:hi]])
+            ops = np.flatnonzero(op_wanted)
+
+        # Each month is reduced to per-date and per-operator sums on its own,
+        # so that a wide range does not copy the cube of all its dates
+        hour_rows, hour_flights, fleet = [], [], []
+        op_rows = op_flights = 0
+        for first, piece in cube.pieces(lo, hi):
+            with phase('filter'):
+                # Plain slices when every date or every operator is selected
+                size = len(piece['flights'])
+                taken = dates[(dates >= first) & (dates < first + size)] - first
+                take = slice(None) if len(taken) == size else taken
+                flights = piece['flights'][take]
+                rows = piece['rows'][take]
+                if len(ops) < len(op_wanted):
+                    flights = flights[:, ops]
+                    rows = rows[:, ops]
+                sel = np.flatnonzero(day_wanted[cube.dayofweek[piece['fleet_date']]]
+                                     & op_wanted[piece['fleet_operator']])
+                fleet.append([piece[name][sel] for name in
+                              ('fleet_operator', 'fleet_manufacturer', 'fleet_model', 'fleet_flights')])
+            with phase('aggregate'):
+                hour_rows.append(rows.sum(axis=1))
+                hour_flights.append(flights.sum(axis=1))
+                op_rows = op_rows + rows.sum(axis=(0, 2))
+                op_flights = op_flights + flights.sum(axis=(0, 2))
+
+        with phase('aggregate'):
+            hour_rows = np.concatenate(hour_rows)
+            hour_flights = np.concatenate(hour_flights)
+            present = hour_rows.sum(axis=1) > 0
+
+            self.nb_rows = int(hour_rows.sum())
+            self.nb_operators = int((op_rows > 0).sum())
+            self.nb_days = int(present.sum())
+            self.nb_flights = hour_flights.sum()
+
+            # One row per date with data
+            dates = self.dates = dates[present]
+            self.daily = pd.DataFrame({
+                'Date': cube.dates[dates],
+                'Year': cube.year[dates],
+                'ISOYear': cube.isoyear[dates],
+                'WeekNumber': cube.week[dates],
+                'DayOfWeek': np.asarray(weekdays)[cube.dayofweek[dates]],
+                'Period': cube.period[dates],
+                'NumberFlights': hour_flights[present].sum(axis=1),
+            })
+
+            # One row per (date, hour) with data, rows without a valid hour left out
+            date_pos, hour_pos = np.nonzero(hour_rows[present, :-1])
+            self.hour_pos = hour_pos
+            self.hourly = pd.DataFrame({
+                'Date': self.daily['Date'].values[date_pos],
+                'WeekNumber': self.daily['WeekNumber'].values[date_pos],
+                'DayOfWeek': self.daily['DayOfWeek'].values[date_pos],
+                'Hour': cube.hours[hour_pos],
+                'NumberFlights': hour_flights[present][date_pos, hour_pos],
+            })
+
+            # Totals per operator, then the top model and manufacturer from the fleet table
+            self.operators = ops[op_rows > 0]
+            self.operator_flights = op_flights[op_rows > 0]
+            self.fleet = tuple(np.concatenate(column) for column in zip(*fleet))
+
+    # Averages per hour of the day and per day of the week. The sums are
+    # taken per (week, day of the week, hour) with the week counted with its
+    # ISO year, so that the same week number of two years is not merged. Such
+    # a (week, day) pair is a single date: the sums are the daily and hourly
+    # cells already in the selection, and each mean is one bincount over them.
+
+    def hour_means(self):
+        hours = self.cube.hours
+        totals = np.bincount(self.hour_pos, weights=self.hourly['NumberFlights'].values, minlength=len(hours))
+        counts = np.bincount(self.hour_pos, minlength=len(hours))
+        seen = counts > 0
+        return pd.DataFrame({'Hour': hours[seen], 'NumberFlights': totals[seen] / counts[seen]})
+
+    def dayofweek_means(self):
+        day = self.cube.dayofweek[self.dates]
+        totals = np.bincount(day, weights=self.daily['NumberFlights'].values, minlength=len(weekdays))
+        counts = np.bincount(day, minlength=len(weekdays))
+        seen = counts > 0
+        return pd.DataFrame({'DayOfWeek': np.asarray(weekdays)[seen],
+                             'NumberFlights': totals[seen] / counts[seen]})
+
+    def series(self, resolution):
+        """Flights per 'hour', 'day' or 'week', as times in ms since epoch and totals sorted by time."""
+        # Built on the first zoom needing this resolution, then only sliced
+        if resolution not in self._series:
+            with phase('aggregate'):
+                self._series[resolution] = self._build_series(resolution)
+        return self._series[resolution]
+
+    def _build_series(self, resolution):
+        flights = self.daily['NumberFlights'].values
+        if resolution == 'hour':
+            hourly = self.hourly
+            times = (hourly['Date'].values.astype('datetime64[ms]').astype(np.int64)
+                     + (hourly['Hour'].values * MS_PER_HOUR).astype(np.int64))
+            return times, hourly['NumberFlights'].values
+        if resolution == 'week':
+            weeks, week_pos = np.unique(self.cube.week_start[self.dates], return_inverse=True)
+            return weeks.astype(np.int64) * MS_PER_DAY, np.bincount(week_pos, weights=flights)
+        return self.cube.days[self.dates].astype(np.int64) * MS_PER_DAY, flights
+
+    def operator_table(self):
+        # Built once per selection, then only filtered, sorted and paged
+        if self._operator_table is None:
+            with phase('aggregate'):
+                self._operator_table = self._build_operator_table()
+        return self._operator_table
+
+    def _build_operator_table(self):
+        cube = self.cube
+        operator, manufacturer, model, flights = self.fleet
+        order = np.argsort(-self.operator_flights, kind='mergesort')
+        ops = self.operators[order]
+
+        # Flights per (operator, model) and per (operator, manufacturer) in a
+        # single reduction over the fleet table: one row per operator, the
+        # models then the manufacturers, each followed by its missing slot
+        n_mod = len(cube.models) + 1
+        width = n_mod + len(cube.manufacturers) + 1
+        keys = np.concatenate([operator * width + model, operator * width + n_mod + manufacturer])
+        sums = np.bincount(keys, weights=np.concatenate([flights, flights]),
+                           minlength=(len(cube.operators) + 1) * width).reshape(-1, width)[ops]
+        columns = []
+        for values, lo, hi in ((cube.models, 0, n_mod - 1), (cube.manufacturers, n_mod, width - 1)):
+            best = sums[:, lo:hi].argmax(axis=1)
+            names = np.asarray(values, dtype=object)[best]
+            names[sums[:, lo:hi].max(axis=1) <= 0] = None
+            columns.append(names)
+        return pd.DataFrame({
+            'Operator': np.asarray(cube.operators, dtype=object)[ops],
+            'Total No. of flights': self.operator_flights[order],
+            'Most used aircraft': columns[0],
+            'Favorite manufacturer': columns[1],
+        })
+
+
+class Dataset:
+    """The cleaned frame and everything derived from it.
+
+    A new Dataset is built whenever flights are appended to the data file and
+    swapped in with a single assignment, so callbacks already running keep
+    working on the one they started with.  A dataset mapped from the store
+    only loads the frame itself if something asks for the raw rows.
+    """
+
+    def __init__(self, index, cube, info, offset=0, version=0, df=None, folder=None):
+        self.index = index
+        self.cube = cube
+        self.info = info
+        self.offset = offset
+        self.version = version
+        self.folder = folder
+        self._df = df
+        # (dataset, [rows, ...]) of an appended dataset whose frame is not
+        # built yet: the frame of that dataset followed by the rows
+        self._frames = None
+
+        # Range of the calendar
+        self.start_date = pd.Timestamp(info['start_date'])
+        self.end_date = pd.Timestamp(info['end_date'])
+
+        # Operator option 
+        self.operator_options = np.asarray(info['operator_options'], dtype=object)
+        # Flights of each operator, ranking the matches of the operator search
+        self.operator_flights = np.asarray(info['operator_flights'])
+        self._operator_search = None
+
+        #Manufacturer options
+        self.manufacturer_options = np.asarray(info['manufacturer_options'], dtype=object)
+
+        self.years = np.asarray(info['years'])
+
+        # Identifies the data itself, the same in every worker process unlike the version
+        self.tag = hashlib.sha1(json.dumps([info['files'], offset, info['start_date'], info['end_date'],
+                                            info['operator_flights']]).encode()).hexdigest()[:16]
+
+    @classmethod
+    def from_frame(cls, df, offset=0, version=0, files=None):
+        # Rows are kept sorted by date so that a date range is a contiguous slice
+        df = df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+        index = FilterIndex.build(df)
+        operators = df.Operator.dropna().unique().tolist()
+        flights = df.groupby('Operator', observed=True)['NumberFlights'].sum()
+        info = {
+            'start_date': min(df['Date']).isoformat(),
+            'end_date': max(df['Date']).isoformat(),
+            'operator_options': operators,
+            'operator_flights': flights.reindex(operators, fill_value=0).tolist(),
+            'manufacturer_options': df.Manufacturer.unique().tolist(),
+            'years': df.ISOYear.unique().tolist(),
+            'files': files,
+        }
+        return cls(index, FlightCube.build(df, index), info, offset, version, df=df)
+
+    @classmethod
+    def map(cls, folder, version=0):
+        """Map a dataset saved in ``folder``, read-only."""
+        with open(os.path.join(folder, 'meta.json')) as f:
+            meta = json.load(f)
+        index = FilterIndex(map_arrays(folder, 'index', meta['index']['arrays']),
+                            meta['index']['categories'])
+        cube = FlightCube(index, map_arrays(folder, 'cube', FlightCube.arrays), folder)
+        return cls(index, cube, meta['info'], meta['offset'], version, folder=folder)
+
+    def save(self, folder):
+        frame, dtypes = self.frame_arrays()
+        save_arrays(folder, 'frame', frame)
+        save_arrays(folder, 'index', self.index.arrays)
+        save_arrays(folder, 'cube', {name: getattr(self.cube, name) for name in FlightCube.arrays})
+        for p, part in enumerate(self.cube.parts):
+            if isinstance(part, dict):
+                save_arrays(folder, 'cube-%d' % p, part)
+            else:
+                link_arrays(part, folder, 'cube-%d' % p, FlightCube.partition_arrays)
+        meta = {
+            'offset': self.offset,
+            'info': self.info,
+            'frame': {'arrays': list(frame), 'dtypes': dtypes},
+            'index': {'arrays': list(self.index.arrays),
+                      'categories': {col: values.tolist() for col, values in self.index.categories.items()}},
+        }
+        # Written last, its presence marks a complete store
+        with open(os.path.join(folder, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def frame_arrays(self):
+        """The frame as encoded in the store, without decoding it from there."""
+        if self._df is not None:
+            return encode_frame(self._df)
+        if self._frames is None:
+            with open(os.path.join(self.folder, 'meta.json')) as f:
+                meta = json.load(f)['frame']
+            return map_arrays(self.folder, 'frame', meta['arrays']), meta['dtypes']
+        data, tails = self._frames
+        arrays, dtypes = data.frame_arrays()
+        # Codes of the categories of the whole frame
+        tails = [encode_frame(rows.assign(**{name: rows[name].cat.set_categories(info['categories'])
+                                             for name, info in dtypes.items() if 'categories' in info}))[0]
+                 for rows in tails]
+        return {name: np.concatenate([values] + [tail[name] for tail in tails])
+                for name, values in arrays.items()}, dtypes
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = decode_frame(*self.frame_arrays())
+            self._frames = None
+        return self._df
+
+    def search_operators(self, query, limit):
+        """Up to ``limit`` operator names containing ``query``, ignoring case.
+
+        Names starting with the query come first, then the others, each group
+        by decreasing number of flights.
+        """
+        if self._operator_search is None:
+            order = np.argsort(-self.operator_flights, kind='mergesort')
+            names = self.operator_options[order]
+            self._operator_search = names, np.char.lower(names.astype(str))
+        names, lowered = self._operator_search
+        if not query:
+            return names[:limit].tolist()
+        found = np.char.find(lowered, query.lower())
+        matches = np.concatenate([np.flatnonzero(found == 0), np.flatnonzero(found > 0)])
+        return names[matches[:limit]].tolist()
+
+    def append(self, rows, offset, version):
+        """Dataset of these rows followed by ``rows``.
+
+        Rows from the last date on, of known operators, manufacturers, models
+        and hours, the usual tail of the file, extend the index and the last
+        months of the cube. Anything else rebuilds it all from the frame.
+        """
+        rows = rows.sort_values('Date', kind='mergesort').reset_index(drop=True)
+        if not self.extends(rows):
+            return Dataset.from_frame(concat_frames([self.df, rows]), offset, version, self.info['files'])
+        tail = FilterIndex.build(rows, self.index.categories)
+        index = self.index.extend(tail)
+        flights = rows.groupby('Operator', observed=True)['NumberFlights'].sum()
+        info = dict(self.info)
+        info['end_date'] = rows['Date'].iloc[-1].isoformat()
+        info['operator_flights'] = (self.operator_flights
+                                    + flights.reindex(self.operator_options, fill_value=0).values).tolist()
+        info['years'] = self.info['years'] + [year for year in rows.ISOYear.unique().tolist()
+                                              if year not in self.info['years']]
+        appended = Dataset(index, self.cube.extend(rows, tail, index), info, offset, version)
+        data, tails = self._frames or (self, [])
+        appended._frames = (data, tails + [rows])
+        return appended
+
+    def extends(self, rows):
+        # Whether the date-sorted rows can be appended without a rebuild
+        if rows['Date'].iloc[0] < self.end_date:
+            return False
+        for col in ('Operator', 'Manufacturer', 'Model'):
+            if not pd.Index(rows[col].dropna().unique()).isin(self.index.categories[col]).all():
+                return False
+        hours = rows['Hour'].dropna().to_numpy('float64')
+        return bool(np.isin(hours, self.cube.hours).all())
+
+def build_dataset(path, version=0, previous=None):
+    # Parse only the tail of the last file when it grew since the previous
+    # dataset and the other files are the same, and its store is still there
+    files = source_files(path)
+    if (previous is not None and previous.info.get('files') == files
+            and os.path.getsize(files[-1]) >= previous.offset
+            and (previous.folder is None or os.path.exists(previous.folder))):
+        rows, offset = read_data(files[-1], previous.offset)
+        if rows is None or not len(rows):
+            previous.offset = offset
+            return previous
+        return previous.append(rows, offset, version)
+    rows, offset, files = read_sources(path)
+    return Dataset.from_frame(rows, offset, version, files)
+
+def write_store(path, folder, data):
+    tmp = '%s.tmp-%d' % (folder, os.getpid())
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        data.save(tmp)
+        os.rename(tmp, folder)
+    except OSError:
+        logger.exception('Failed to write the data store in %s', DATA_CACHE_DIR)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    return True
+
+def drop_old_stores(path, folder):
+    # Datasets mapped from an older store load its partitions and frame
+    # lazily, in the other workers until their next poll and in the requests
+    # in flight: it is only dropped STORE_GRACE_SECONDS after ``folder``
+    try:
+        written = os.path.getmtime(os.path.join(folder, 'meta.json'))
+        if time.time() - written < STORE_GRACE_SECONDS:
+            return
+        prefix = store_prefix(path)
+        for name in os.listdir(DATA_CACHE_DIR):
+            old = os.path.join(DATA_CACHE_DIR, name)
+            if name.startswith(prefix) and old != folder and os.path.getmtime(old) < written:
+                shutil.rmtree(old, ignore_errors=True)
+    except OSError:
+        logger.exception('Failed to drop the older data stores')
+
+def load_dataset(path, version=0, previous=None):
+    """Return the dataset of ``path``, mapped from the store when it is enabled.
+
+    The first worker to need a version of the file builds its store while
+    holding a lock, the others wait for it and then map the same files.
+    """
+    if not DATA_CACHE_DIR:
+        return build_dataset(path, version, previous)
+
+    os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+    with open(os.path.join(DATA_CACHE_DIR, '.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        folder, size = cache_folder(path)
+        if not os.path.exists(os.path.join(folder, 'meta.json')):
+            data = build_dataset(path, version, previous)
+            # Only store what matches the file the key was taken from
+            if data is previous or data.offset != size or cache_folder(path)[0] != folder:
+                return data
+            if not write_store(path, folder, data):
+                return data
+        try:
+            data = Dataset.map(folder, version)
+        except (OSError, ValueError, KeyError):
+            logger.exception('Failed to map the data store %s', folder)
+            return build_dataset(path, version, previous)
+        drop_old_stores(path, folder)
+        return data
+
+def follow_data(path, interval):
+    """Merge the flights appended to ``path`` into the dataset as they arrive.
+
+    Only the bytes of the last file after the last parsed offset are read;
+    the new dataset is built off the request threads and swapped in once
+    ready.
+    """
+    global dataset
+    while True:
+        time.sleep(interval)
+        try:
+            files = source_files(path)
+            size = os.path.getsize(files[-1])
+            previous = dataset
+            if files != previous.info.get('files') or size < previous.offset:
+                # A partition was added or removed, or the file was truncated
+                # or replaced, start over
+                dataset = load_dataset(path, previous.version + 1)
+            elif size > previous.offset:
+                dataset = load_dataset(path, previous.version + 1, previous=previous)
+            if dataset is not previous:
+                invalidate_caches()
+                if WARM_UP:
+                    warm_up(dataset)
+            if dataset.folder is not None:
+                drop_old_stores(path, dataset.folder)
+        except Exception:
+            logger.exception('Failed to ingest %s', path)
+
+dataset = load_dataset(DATA_PATH)
 
 # Create the app
 app = dash.Dash(__name__)
 server = app.server
 
+# Instrumentation of the callbacks, exposed on /metrics in the Prometheus
+# text format. Each callback records its wall time split by phase (the
+# time between its return and the response being sent is the JSON
+# serialization done by Dash), the size of the selection, the rows left
+# after the filter and the bytes of the response.
+# Metrics are per process: with several workers each one reports its own.
+
+# Callbacks slower than this many seconds are logged (0 disables the log)
+SLOW_CALLBACK_SECONDS = float(os.environ.get('SLOW_CALLBACK_SECONDS', 0))
+
+PHASES = ['filter', 'aggregate', 'figure', 'serialize', 'other']
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for le, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            yield '%s_bucket{%s,le="%s"} %d' % (name, labels, le, cumulative)
+        yield '%s_sum{%s} %s' % (name, labels, self.sum)
+        yield '%s_count{%s} %d' % (name, labels, self.count)
+
+class CallbackTiming:
+    """Time spent by one callback call in each phase.
+
+    Phases nest: entering one pauses the phase it was started from, so that
+    each moment is charged to a single phase.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = self.mark = time.perf_counter()
+        self.end = None
+        self.stack = ['other']
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.operators = None
+        self.days = None
+        self.rows = None
+        self.bytes = None
+
+    def charge(self):
+        now = time.perf_counter()
+        self.phases[self.stack[-1]] += now - self.mark
+        self.mark = now
+
+class CallbackMetrics:
+    histograms = {
+        'dash_callback_duration_seconds': ('Wall time of the callbacks', 'seconds',
+                                           [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]),
+        'dash_callback_response_bytes': ('Size of the callback responses', 'bytes',
+                                         [1e3, 1e4, 1e5, 1e6, 1e7]),
+        'dash_callback_selected_operators': ('Operators selected in the filter', 'operators',
+                                             [1, 10, 100, 1000, 10000]),
+        'dash_callback_selected_days': ('Days of the week selected in the filter', 'days',
+                                        [0, 1, 2, 3, 4, 5, 6, 7]),
+        'dash_callback_filtered_rows': ('Rows left after the filter', 'rows',
+                                        [1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8]),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {name: {} for name in self.histograms}
+        self.phases = {}
+
+    def observe(self, name, callback, value):
+        if value is None:
+            return
+        values = self.values[name]
+        if callback not in values:
+            values[callback] = Histogram(self.histograms[name][2])
+        values[callback].observe(value)
+
+    def record(self, timing, total):
+        with self.lock:
+            self.observe('dash_callback_duration_seconds', timing.name, total)
+            self.observe('dash_callback_response_bytes', timing.name, timing.bytes)
+            self.observe('dash_callback_selected_operators', timing.name, timing.operators)
+            self.observe('dash_callback_selected_days', timing.name, timing.days)
+            self.observe('dash_callback_filtered_rows', timing.name, timing.rows)
+            for phase_name, seconds in timing.phases.items():
+                key = (timing.name, phase_name)
+                self.phases[key] = self.phases.get(key, 0.0) + seconds
+
+    def export(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, _, _) in self.histograms.items():
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s histogram' % name)
+                for callback, histogram in sorted(self.values[name].items()):
+                    lines.extend(histogram.lines(name, 'callback="%s"' % callback))
+            lines.append('# HELP dash_callback_phase_seconds_total Time spent by the callbacks in each phase')
+            lines.append('# TYPE dash_callback_phase_seconds_total counter')
+            for (callback, phase_name), seconds in sorted(self.phases.items()):
+                lines.append('dash_callback_phase_seconds_total{callback="%s",phase="%s"} %s'
+                             % (callback, phase_name, seconds))
+        return '\n'.join(lines) + '\n'
+
+callback_metrics = CallbackMetrics()
+_timing = threading.local()
+
+@contextlib.contextmanager
+def phase(name):
+    timing = getattr(_timing, 'current', None)
+    if timing is None:
+        yield
+        return
+    timing.charge()
+    timing.stack.append(name)
+    try:
+        yield
+    finally:
+        timing.charge()
+        timing.stack.pop()
+
+def note_selection(operator_selected, dayofweek, selection):
+    timing = getattr(_timing, 'current', None)
+    if timing is not None:
+        if ALL_OPERATORS in (operator_selected or []):
+            timing.operators = len(dataset.operator_options)
+        else:
+            timing.operators = len(set(operator_selected or []))
+        timing.days = len(set(dayofweek or []))
+        timing.rows = selection.nb_rows
+
+def add_timing(task):
+    # Charge the time a pool process spent on a task to the callback delivering its outputs
+    timing = getattr(_timing, 'current', None)
+    if timing is None or task is None:
+        return
+    for phase_name, seconds in task.phases.items():
+        timing.phases[phase_name] += seconds
+    for name in ('operators', 'days', 'rows'):
+        if getattr(task, name) is not None:
+            setattr(timing, name, getattr(task, name))
+
+def finish_timing(timing, now):
+    total = now - timing.start
+    callback_metrics.record(timing, total)
+    if SLOW_CALLBACK_SECONDS and total > SLOW_CALLBACK_SECONDS:
+        logger.warning('Slow callback %s: %.3fs (%s), %s operators, %s days, %s rows, %s bytes',
+                       timing.name, total,
+                       ', '.join('%s %.3fs' % item for item in timing.phases.items() if item[1]),
+                       timing.operators, timing.days, timing.rows, timing.bytes)
+
+def instrumented(func):
+    """Record the metrics of a callback, completed once its response is sent."""
+    @functools.wraps(func)
+    def wrapper(*args):
+        timing = _timing.current = CallbackTiming(func.__name__)
+        try:
+            return func(*args)
+        finally:
+            timing.charge()
+            timing.end = time.perf_counter()
+            _timing.current = None
+            if flask.has_request_context():
+                flask.g.callback_timing = timing
+            else:
+                finish_timing(timing, timing.end)
+    return wrapper
+
+@server.after_request
+def record_callback(response):
+    timing = flask.g.pop('callback_timing', None)
+    if timing is not None:
+        now = time.perf_counter()
+        timing.phases['serialize'] += now - timing.end
+        timing.bytes = 0 if response.is_streamed else len(response.get_data())
+        finish_timing(timing, now)
+    return response
+
+@server.route('/metrics')
+def metrics():
+    lines = ['# HELP data_rejected_lines_total Lines of the data files that could not be parsed',
+             '# TYPE data_rejected_lines_total counter']
+    lines.extend('data_rejected_lines_total{reason="%s"} %d' % item for item in sorted(rejected_lines.items()))
+    return flask.Response(callback_metrics.export() + '\n'.join(lines) + '\n',
+                          mimetype='text/plain; version=0.0.4')
+
+# Background jobs
+
+# Heavy dashboard outputs are computed by a pool of JOB_WORKERS processes (0 to
+# compute them in the request instead), polled by the page every
+# JOB_POLL_INTERVAL seconds
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.25))
+
+# The pool processes are forked so that they share the mapped dataset
+if JOB_WORKERS and 'fork' not in multiprocessing.get_all_start_methods():
+    logger.warning('Background jobs need fork, computing in the requests instead')
+    JOB_WORKERS = 0
+
+# Slots of the flags telling a running job whether it is still wanted
+JOB_SLOTS = 1024
+
+_job_lock = threading.Lock()
+_job_pool = None
+# Number of the job allowed to run in each slot (see run_job)
+_job_flags = None
+
+def reset_job_worker(flags):
+    # A pool process is forked from a running server: start from new caches,
+    # metrics and locks rather than from the copies of the parent, whose
+    # locks may be held by threads that do not exist here
+    global selection_cache, render_cache, partition_cache, api_cache, callback_metrics
+    global _job_lock, _job_pool, _jobs, _job_flags
+    selection_cache = LRUCache(SELECTION_CACHE_SIZE)
+    render_cache = LRUCache(RENDER_CACHE_ENTRIES, RENDER_CACHE_BYTES, sizeof=value_size)
+    partition_cache = LRUCache(1024, PARTITION_CACHE_BYTES, sizeof=partition_size)
+    api_cache = LRUCache(256, API_CACHE_BYTES, sizeof=len)
+    callback_metrics = CallbackMetrics()
+    _job_lock = threading.Lock()
+    _job_pool = None
+    _jobs = {}
+    _job_flags = flags
+    _timing.current = None
+
+def job_pool():
+    # Created on first use, once the dataset is loaded, and again after new data
+    global _job_pool, _job_flags
+    if _job_pool is None:
+        context = multiprocessing.get_context('fork')
+        _job_flags = context.RawArray('q', JOB_SLOTS)
+        _job_pool = ProcessPoolExecutor(JOB_WORKERS, mp_context=context, initializer=reset_job_worker,
+                                        initargs=(_job_flags,))
+    return _job_pool
+
+def stop_jobs():
+    global _job_pool
+    with _job_lock:
+        pool, _job_pool = _job_pool, None
+        for job in _jobs.values():
+            job.cancel()
+        _jobs.clear()
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Rows per page of the operator table
+TABLE_PAGE_SIZE = 10
+
+# Outputs of update_dashboard that depend on the selection (see JOB_TASKS)
+DASHBOARD_OUTPUTS = 10
+
+# Operators offered by the dropdown while searching, the most flown first
+OPERATOR_SEARCH_RESULTS = int(os.environ.get('OPERATOR_SEARCH_RESULTS', 50))
+ALL_OPERATORS_OPTION = {'label': 'All operators', 'value': ALL_OPERATORS}
+
+def default_inputs(data):
+    """Inputs of the dashboard as a new page has them: every operator and day, the whole calendar."""
+    return ([ALL_OPERATORS], weekdays, int(data.years[-1]), data.start_date, data.end_date,
+            0, TABLE_PAGE_SIZE, (), '')
+
+# The data the page shows, told by its tag, the same in every worker, and
+# its number of rows, so that a worker which has not read the new flights
+# yet does not take the page back to the previous data
+def published_version(data):
+    return {'tag': data.tag, 'rows': len(data.index.day), 'end_date': data.end_date}
+
 # Create app layout
-app.layout = html.Div(
-    [
-        html.Div(
-            [
-                html.Img(
-                    src=app.get_asset_url('insa.png'),
-                    className='two columns',
-                ),
-                html.Div(
-                    [
-                        html.H3(
-                            'Data Visualisation of the French Air Traffic',
-                        ),
-                        html.H6(
-                            'Made by Axolotl Team',
-                        ),
-                        html.H6(
-                            html.A(
-                                'Go to the Autoencoder Interface',
-                                href = 'http://192.168.37.106:50001/ae_interface',
-                                style={'text-decoration':'none'}
-                            )
-                        ),
-                    ],
-                    className='eight columns',
-                    style = {'text-align':'center', 'margin-bottom':'30px'},
-                ),
-                html.Img(
-                    src=app.get_asset_url('logos.png'),
-                    className="two columns",
-                )
-            ],
-            id="header",
-            className='row',
-        ),
-        html.Div(
-            [
-                html.Div(
-                    [
-                        html.H6(
-                            'Filter by flight date :',
-                            className="control_label"
-                        ),   
-                        dcc.DatePickerRange(
-                            id='date_picker_range',
-                            day_size=50,
-                            display_format='DD-MM-YYYY',
-                            min_date_allowed=start_date,
-                            max_date_allowed=end_date + dt.timedelta(days=1),
-                            start_date = start_date,
-                            end_date=end_date,
-                            className='dcc_control'
-                        ),
-                        html.H6(
-                            'Filter by day of the week:',
-                            className="control_label"
-                        ),
-                        dcc.RadioItems(
-                            id='day_selector',
-                            options=[
-                                {'label': 'All', 'value': 'all'},
-                                {'label': 'Customized ', 'value': 'customized'},
-                                {'label': 'None ', 'value': 'none'},
-                            ],
-                            value='all',
-                            labelStyle={'display': 'inline-block'},
-                            className="dcc_control"
-                        ),
-
-                        dcc.Dropdown(
-                            id='day_dropdown',
-                            options=[{'label': i, 'value': i} for i in weekdays],
-                            value= weekdays,
-                            multi=True,
-                        ),                   
-                        html.H6(
-                            'Filter by Operator:',
-                            className="control_label"
-                        ),
-                        dcc.RadioItems(
-                            id='operator_selector',
-                            options=[
-                                {'label': 'All', 'value': 'all'},
-                                {'label': 'Customized ', 'value': 'customized'},
-                                {'label': 'None ', 'value': 'none'},
-                            ],
-                            value='all',
-                            labelStyle={'display': 'inline-block'},
-                            className="dcc_control"
-                        ),
-                        dcc.Dropdown(
-                            id='operator_dropdown',
-                            options=[{'label': i, 'value': i} for i in df.Operator.unique()],
-                            value= df.Operator.unique(),
-                            multi=True,
-                            style={ "overflow-y":"scroll", "max-height": "250px"},
-                        ), 
+# Built on every page load so that new visitors get the live calendar and
+# operators, along with the outputs of the default view: the heavy callbacks
+# are not called when the page loads, and warm_up has these outputs cached
+def serve_layout():
+    data = dataset
+    inputs = default_inputs(data)
+    # Dash also calls it once outside of any request, to validate the callbacks
+    view = compute_dashboard(*inputs) if flask.has_request_context() else [None] * DASHBOARD_OUTPUTS
+    return html.Div(
+        [
+            dcc.Store(
+                id='data_version',
+                data=published_version(data),
+            ),
+            dcc.Interval(
+                id='ingest_interval',
+                interval=max(INGEST_POLL_INTERVAL, 1) * 1000,
+                disabled=INGEST_POLL_INTERVAL <= 0,
+            ),
+            # Identifies the page, whose newer selections cancel its older jobs
+            dcc.Store(
+                id='session_id',
+                data=uuid.uuid4().hex,
+            ),
+            dcc.Store(id='job'),
+            dcc.Interval(
+                id='job_interval',
+                interval=JOB_POLL_INTERVAL * 1000,
+                disabled=True,
+            ),
+            html.Div(
+                [
+                    html.Img(
+                        src=app.get_asset_url('insa.png'),
+                        className='two columns',
+                    ),
+                    html.Div(
+                        [
+                            html.H3(
+                                'Data Visualisation of the French Air Traffic',
+                            ),
+                            html.H6(
+                                'Made by Axolotl Team',
+                            ),
+                            html.H6(
+                                html.A(
+                                    'Go to the Autoencoder Interface',
+                                    href = 'http://192.168.37.106:50001/ae_interface',
+                                    style={'text-decoration':'none'}
+                                )
+                            ),
+                        ],
+                        className='eight columns',
+                        style = {'text-align':'center', 'margin-bottom':'30px'},
+                    ),
+                    html.Img(
+                        src=app.get_asset_url('logos.png'),
+                        className="two columns",
+                    )
+                ],
+                id="header",
+                className='row',
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H6(
+                                'Filter by flight date :',
+                                className="control_label"
+                            ),   
+                            dcc.DatePickerRange(
+                                id='date_picker_range',
+                                day_size=50,
+                                display_format='DD-MM-YYYY',
+                                min_date_allowed=data.start_date,
+                                max_date_allowed=data.end_date + dt.timedelta(days=1),
+                                start_date = data.start_date,
+                                end_date=data.end_date,
+                                className='dcc_control'
+                            ),
+                            html.H6(
+                                'Filter by day of the week:',
+                                className="control_label"
+                            ),
+                            dcc.RadioItems(
+                                id='day_selector',
+                                options=[
+                                    {'label': 'All', 'value': 'all'},
+                                    {'label': 'Customized ', 'value': 'customized'},
+                                    {'label': 'None ', 'value': 'none'},
+                                ],
+                                value='all',
+                                labelStyle={'display': 'inline-block'},
+                                className="dcc_control"
+                            ),
+
+                            dcc.Dropdown(
+                                id='day_dropdown',
+                                options=[{'label': i, 'value': i} for i in weekdays],
+                                value= weekdays,
+                                multi=True,
+                            ),                   
+                            html.H6(
+                                'Filter by Operator:',
+                                className="control_label"
+                            ),
+                            dcc.RadioItems(
+                                id='operator_selector',
+                                options=[
+                                    {'label': 'All', 'value': 'all'},
+                                    {'label': 'Customized ', 'value': 'customized'},
+                                    {'label': 'None ', 'value': 'none'},
+                                ],
+                                value='all',
+                                labelStyle={'display': 'inline-block'},
+                                className="dcc_control"
+                            ),
+                            dcc.Dropdown(
+                                id='operator_dropdown',
+                                options=[ALL_OPERATORS_OPTION] + [
+                                    {'label': i, 'value': i}
+                                    for i in data.search_operators('', OPERATOR_SEARCH_RESULTS)],
+                                value=inputs[0],
+                                placeholder='Search operators...',
+                                multi=True,
+                                style={ "overflow-y":"scroll", "max-height": "250px"},
+                            ), 
                                 
-                    ],
-                    className="pretty_container four columns"
-                ),
-                html.Div(
-                    [
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.H6(
-                                            id="nb_operator",
-                                            className="info_text"
-                                        ),
-                                        html.P("No. of operators"),
-                                    ],                       
-                                    className="pretty_container four columns",
-                                    style = {'text-align':'center'}
-                                ),
-
-                                html.Div(
-                                    [
-                                        html.H6(
-                                            id="nb_flights",
-                                            className="info_text"
-                                        ),
-                                        html.P("No. of flights"),
-                                    ],
-                                    className="pretty_container four columns",
-                                    style = {'text-align':'center'}
-                                ),
-
-                                html.Div(
-                                    [
-                                        html.H6(
-                                            id="nb_days",
-                                            className="info_text"
-                                        ),
-                                        html.P("No. of days"),
-                                    ],
-                                    className="pretty_container four columns",
-                                    style = {'text-align':'center'}
-                                ),
+                        ],
+                        className="pretty_container four columns"
+                    ),
+                    html.Div(
+                        [
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.H6(
+                                                view[4],
+                                                id="nb_operator",
+                                                className="info_text"
+                                            ),
+                                            html.P("No. of operators"),
+                                        ],                       
+                                        className="pretty_container four columns",
+                                        style = {'text-align':'center'}
+                                    ),
+
+                                    html.Div(
+                                        [
+                                            html.H6(
+                                                view[5],
+                                                id="nb_flights",
+                                                className="info_text"
+                                            ),
+                                            html.P("No. of flights"),
+                                        ],
+                                        className="pretty_container four columns",
+                                        style = {'text-align':'center'}
+                                    ),
+
+                                    html.Div(
+                                        [
+                                            html.H6(
+                                                view[6],
+                                                id="nb_days",
+                                                className="info_text"
+                                            ),
+                                            html.P("No. of days"),
+                                        ],
+                                        className="pretty_container four columns",
+                                        style = {'text-align':'center'}
+                                    ),
                                          
-                            ],
-                            id="infoContainer",
-                            className="row",
-                            style = {'display':'flex', 'align-items': 'center'}
-                        ), 
-                        html.Div(
-                            [
-                                html.H6(
-                                    'Number of flights per date',
-                                    className='title-plot'
-                                ),
-                                dcc.Graph(
-                                    id='total_graph',
-                                )
-                            ],
-                            id="countGraphContainer",
-                            className="pretty_container"
-                        )
-                    ],
-                    id="rightCol",
-                    className="eight columns"
-                )
-            ],
-            className="row"
-        ),
-        html.Div(
-            [
-                html.Div(
-                    [
-                        
-                        html.H6(
-                            'Number of flights per week',
-                            className='title-plot'
-                        ),
-                        html.Div(
-                            [
-                                html.H6(
-                                    'Year : ',
-                                    className="control_label",
-                                    style={'margin-right':'1em','margin-left':'1em'}
-                                ),
-                                dcc.Dropdown(
-                                    id='year_week_dropdown',
-                                    options=[{'label': i, 'value': i} for i in df.Year.unique()],
-                                    value= 2020,
-                                    multi=False,
-                                    style=dict(
-                                        width='100px',
-                                        display='inline-block',
-                                        verticalAlign="middle",
-                                        color='rgb(21, 127, 255)'
+                                ],
+                                id="infoContainer",
+                                className="row",
+                                style = {'display':'flex', 'align-items': 'center'}
+                            ), 
+                            html.P(
+                                id='job_progress',
+                                className="control_label",
+                                style = {'text-align':'center'}
+                            ),
+                            html.Div(
+                                [
+                                    html.H6(
+                                        'Number of flights per date',
+                                        className='title-plot'
+                                    ),
+                                    dcc.Graph(
+                                        id='total_graph',
+                                        figure=view[0],
                                     )
-                                ),
-                            ],
-                            style={'display':'flex','align-items':'center'}
-                        ),
-                        dcc.Graph(
-                            id='week_graph',
-                        )
-                    ],
-                    className='pretty_container eight columns',
-                ),
-                html.Div(
-                    [ 
-                        html.H6(
-                            'Average No. of flights per hour of the day',
-                            className='title-plot',
-                            style={'margin-bottom':'20px'}
-                        ),
-                        dcc.Graph(
-                            id='hour_graph'
+                                ],
+                                id="countGraphContainer",
+                                className="pretty_container"
                             )
-                    ],
-                    className='pretty_container four columns',
-                ),
-            ],
-            className='row'
-        ),
-        html.Div(
-            [
-                html.Div(
-                    [
-                        html.H6(
-                            'Proportion of the air trafic by day of the week',
-                            className='title-plot'
-                        ),
-                        dcc.Graph(id='weekday_graph')
-                    ],
-                    className='pretty_container four columns',
-                ),
-                html.Div(
-                    [
-                        html.H4(
-                            'Operators of the french air trafic',
-                            className = 'title',
-                        ),
-                        dash_table.DataTable(
-                            id='data_table',
-                            columns=[
-                                {"name": i, "id": i} for i in ['Operator','Total No. of flights','Most used aircraft','Favorite manufacturer']
-                            ],
-                            page_current=0,
-                            page_action='native',
-                            page_size=10,
-                        )
-                    ],
-                    className='pretty_container eight columns',
-                ),
-            ],
-            className='row'
-        ),
-    ],
-    id="mainContainer",
-    style={
-        "display": "flex",
-        "flex-direction": "column"
-    }
-)
+                        ],
+                        id="rightCol",
+                        className="eight columns"
+                    )
+                ],
+                className="row"
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                        
+                            html.H6(
+                                'Number of flights per week',
+                                className='title-plot'
+                            ),
+                            html.Div(
+                                [
+                                    html.H6(
+                                        'Year : ',
+                                        className="control_label",
+                                        style={'margin-right':'1em','margin-left':'1em'}
+                                    ),
+                                    dcc.Dropdown(
+                                        id='year_week_dropdown',
+                                        options=[{'label': i, 'value': i} for i in data.years],
+                                        value=inputs[2],
+                                        multi=False,
+                                        style=dict(
+                                            width='100px',
+                                            display='inline-block',
+                                            verticalAlign="middle",
+                                            color='rgb(21, 127, 255)'
+                                        )
+                                    ),
+                                ],
+                                style={'display':'flex','align-items':'center'}
+                            ),
+                            dcc.Graph(
+                                id='week_graph',
+                                figure=view[1],
+                            )
+                        ],
+                        className='pretty_container eight columns',
+                    ),
+                    html.Div(
+                        [ 
+                            html.H6(
+                                'Average No. of flights per hour of the day',
+                                className='title-plot',
+                                style={'margin-bottom':'20px'}
+                            ),
+                            dcc.Graph(
+                                id='hour_graph',
+                                figure=view[2],
+                                )
+                        ],
+                        className='pretty_container four columns',
+                    ),
+                ],
+                className='row'
+            ),
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H6(
+                                'Proportion of the air trafic by day of the week',
+                                className='title-plot'
+                            ),
+                            dcc.Graph(id='weekday_graph', figure=view[3])
+                        ],
+                        className='pretty_container four columns',
+                    ),
+                    html.Div(
+                        [
+                            html.H4(
+                                'Operators of the french air trafic',
+                                className = 'title',
+                            ),
+                            # Filtered, sorted and paged on the server: only the
+                            # visible page is sent
+                            dash_table.DataTable(
+                                id='data_table',
+                                columns=[
+                                    {"name": i, "id": i, "type": "numeric" if i == 'Total No. of flights' else "text"}
+                                    for i in ['Operator','Total No. of flights','Most used aircraft','Favorite manufacturer']
+                                ],
+                                data=view[7],
+                                page_count=view[8],
+                                page_current=inputs[5],
+                                page_action='custom',
+                                page_size=TABLE_PAGE_SIZE,
+                                sort_action='custom',
+                                sort_mode='multi',
+                                sort_by=[],
+                                filter_action='custom',
+                                filter_query=inputs[8],
+                            )
+                        ],
+                        className='pretty_container eight columns',
+                    ),
+                ],
+                className='row'
+            ),
+        ],
+        id="mainContainer",
+        style={
+            "display": "flex",
+            "flex-direction": "column"
+        }
+    )
+
+app.layout = serve_layout
 
 # filter dataframe based on selected values
 
 def filter_dataframe(df, operator_options, dayofweek, start_date, end_date):
-    dff = df[df['Operator'].isin(operator_options)
-          & (df['DayOfWeek']).isin(dayofweek)
-          & (df['Date'] >= start_date)
-          & (df['Date'] <= end_date)]
-    return dff
+    # The frame of the dataset, if already loaded, is filtered with its index.
+    # Any other frame is indexed sorted by date, keeping its rows in their order.
+    data = dataset
+    if df is data._df:
+        return df.iloc[data.index.select(operator_options, dayofweek, start_date, end_date)]
+    order = np.argsort(df['Date'].values, kind='mergesort')
+    index = FilterIndex.build(df.iloc[order])
+    rows = order[index.select(operator_options, dayofweek, start_date, end_date)]
+    return df.iloc[np.sort(rows)]
 
-# Create callbacks
+# Server-side caches, keyed on the normalised filter state and the dataset version
 
-# make texts above main_figure
-@app.callback(Output('nb_operator', 'children'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def update_operator_text(operator_selected, dayofweek, start_date,end_date):
+class LRUCache:
+    """Thread-safe LRU cache bounded in number of entries and, optionally, in bytes.
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    nb_operators = dff.Operator.unique().shape
-    return nb_operators
+    Callbacks of the same interaction arrive concurrently: the first one
+    computes a missing entry while the others wait for it instead of
+    computing it too.
+    """
 
-@app.callback(Output('nb_flights', 'children'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def update_flights_text(operator_selected, dayofweek, start_date,end_date):
+    def __init__(self, max_entries, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    nb_flights = dff['NumberFlights'].sum()
-    return nb_flights
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            key_lock = self._pending.setdefault(key, threading.Lock())
 
-@app.callback(Output('nb_days', 'children'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def update_day_text(operator_selected, dayofweek, start_date,end_date):
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key][0]
+            try:
+                value = compute()
+                size = self.sizeof(value) if self.sizeof else 0
+            except BaseException:
+                with self._lock:
+                    self._pending.pop(key, None)
+                raise
+            # Stored before the key stops being pending, so that no request
+            # in between sees neither and computes it again
+            with self._lock:
+                if self.max_bytes is None or size <= self.max_bytes:
+                    self._entries[key] = (value, size)
+                    self.bytes += size
+                self._pending.pop(key, None)
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+def filter_key(operator_selected, dayofweek, start_date, end_date):
+    # Normalise the inputs so that equivalent selections share an entry
+    operators = tuple(sorted(set(operator_selected or [])))
+    if ALL_OPERATORS in operators:
+        operators = (ALL_OPERATORS,)
+    days = tuple(sorted(set(dayofweek or []), key=weekdays.index))
+    return operators, days, pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+# Aggregates shared by all callbacks, one entry per filter state: the cube is
+# only filtered once per interaction
+SELECTION_CACHE_SIZE = 16
+selection_cache = LRUCache(SELECTION_CACHE_SIZE)
+
+def get_selection(operator_selected, dayofweek, start_date, end_date, data=None):
+    if data is None:
+        data = dataset
+    key = filter_key(operator_selected, dayofweek, start_date, end_date)
+    selection = selection_cache.get((data.version,) + key, lambda: Selection(data.cube, *key))
+    note_selection(operator_selected, dayofweek, selection)
+    return selection
+
+# Rendered figures and table records, so that flipping back to a view already
+# seen does not build it again
+RENDER_CACHE_ENTRIES = int(os.environ.get('RENDER_CACHE_ENTRIES', 256))
+RENDER_CACHE_BYTES = int(os.environ.get('RENDER_CACHE_MB', 64)) * 2**20
+
+def value_size(value):
+    # Approximate bytes of a figure dict, records or counters, without
+    # serializing them to JSON as Dash does again afterwards
+    if isinstance(value, dict):
+        return sum(len(str(key)) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return len(value) + sum(value_size(item) for item in value)
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.nbytes
+    if isinstance(value, (np.ndarray, pd.Index, pd.Series)):
+        return value_size(value.tolist())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 8
+
+render_cache = LRUCache(RENDER_CACHE_ENTRIES, RENDER_CACHE_BYTES, sizeof=value_size)
+
+def cached_render(func):
+    """Serve the output of a render function from the render cache.
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    nb = dff.Date.unique().shape
-    return nb
+    The function takes the operator and day selections first and the date
+    range last, anything in between (such as the year of the week figure)
+    being part of the key as is.
+    """
+    def cache_key(operator_selected, dayofweek, *args):
+        start_date, end_date = args[-2:]
+        return (func.__name__, dataset.version, args[:-2],
+                filter_key(operator_selected, dayofweek, start_date, end_date))
+
+    @functools.wraps(func)
+    def wrapper(operator_selected, dayofweek, *args):
+        def render():
+            with phase('figure'):
+                value = func(operator_selected, dayofweek, *args)
+                return value.to_dict() if isinstance(value, go.Figure) else value
+        return render_cache.get(cache_key(operator_selected, dayofweek, *args), render)
+    wrapper.cache_key = cache_key
+    return wrapper
+
+# Partitions of the cube mapped from the store, released once they are the
+# least recently used beyond PARTITION_CACHE_MB
+PARTITION_CACHE_BYTES = int(os.environ.get('PARTITION_CACHE_MB', 512)) * 2**20
+
+def partition_size(arrays):
+    return sum(values.nbytes for values in arrays.values())
+
+partition_cache = LRUCache(1024, PARTITION_CACHE_BYTES, sizeof=partition_size)
+
+def invalidate_caches():
+    # Entries of an older dataset are never hit again, free them right away
+    selection_cache.clear()
+    render_cache.clear()
+    partition_cache.clear()
+    api_cache.clear()
+    # Jobs in flight were started on the older dataset
+    stop_jobs()
+
+# Create callbacks
 
 @app.callback(Output('year_week_dropdown', 'options'),
               [Input('operator_dropdown', 'value'),
               Input('day_dropdown','value'),
               Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def set_year_options(operator_selected, dayofweek, start_date,end_date):
+              Input('date_picker_range', 'end_date'),
+              Input('data_version', 'data')],
+              prevent_initial_call=True)
+@instrumented
+def set_year_options(operator_selected, dayofweek, start_date,end_date, data_version):
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    return [{'label': i, 'value': i} for i in dff.Year.unique()]
+    selection = get_selection(operator_selected, dayofweek, start_date, end_date)
+    return [{'label': i, 'value': i} for i in selection.daily.ISOYear.unique()]
 
-@app.callback(Output('year_week_dropdown', 'value'),
-              [Input('year_week_dropdown', 'options')])
-def set_year_value(options):
-    print(options)
-    print(type(options))
-    return options[-1].get('value')
+# Operator options: the selected operators and the best matches of the search
+@app.callback(Output('operator_dropdown', 'options'),
+              [Input('operator_dropdown', 'search_value'),
+              Input('data_version', 'data')],
+              [State('operator_dropdown', 'value')],
+              prevent_initial_call=True)
+@instrumented
+def set_operator_options(search_value, data_version, operator_selected):
+    selected = [i for i in operator_selected or [] if i != ALL_OPERATORS]
+    # Selected operators stay listed, or the dropdown could not show them
+    chosen = set(selected)
+    matches = dataset.search_operators(search_value, OPERATOR_SEARCH_RESULTS + len(chosen))
+    names = selected + [i for i in matches if i not in chosen][:OPERATOR_SEARCH_RESULTS]
+    return [ALL_OPERATORS_OPTION] + [{'label': i, 'value': i} for i in names]
 
-# Radio -> multi
-@app.callback(Output('day_dropdown', 'value'),
-              [Input('day_selector', 'value')],
-              [State('day_dropdown','value')])
-def day_value(selector,prev_value):
-    if selector == 'all':
-        return weekdays
-    elif selector == 'none':
-        return []
-    else:
-        return prev_value
+# Live data: publish the new data and calendar range when the file grows
+@app.callback([Output('data_version', 'data'),
+              Output('date_picker_range', 'min_date_allowed'),
+              Output('date_picker_range', 'max_date_allowed'),
+              Output('date_picker_range', 'end_date')],
+              [Input('ingest_interval', 'n_intervals')],
+              [State('data_version', 'data'),
+              State('date_picker_range', 'end_date')],
+              prevent_initial_call=True)
+@instrumented
+def refresh_data(n_intervals, data_version, picker_end_date):
+    data = dataset
+    if data_version['tag'] == data.tag or len(data.index.day) < data_version['rows']:
+        raise PreventUpdate
+    # Follow the end of the calendar only if the user had not moved away from it
+    if pd.Timestamp(picker_end_date) == pd.Timestamp(data_version['end_date']):
+        picker_end_date = data.end_date
+    return (published_version(data),
+            data.start_date,
+            data.end_date + dt.timedelta(days=1),
+            picker_end_date)
 
-# Radio -> multi
-@app.callback(Output('operator_dropdown', 'value'),
-              [Input('operator_selector', 'value')],
-              [State('operator_dropdown','value')])
-def operator_value(selector,prev_value):
-    if selector == 'all':
-        return operator_options
-    elif selector == 'none':
-        return []
-    else:
-        return prev_value
+# The callbacks below only sync UI state: they run in the browser
+# (assets/scripts.js) instead of costing a request to the server. Like the
+# ones above they are not called on page load, the layout being in sync
 
-# Radio -> multi
-@app.callback(Output('day_selector', 'value'),
-              [Input('day_dropdown', 'value')])
-def day_radio_value(dropdown):
-    if dropdown == weekdays:
-        return 'all'
-    elif dropdown == []:
-        return 'none'
-    else:
-        return 'customized'
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='set_year_value'),
+    Output('year_week_dropdown', 'value'),
+    [Input('year_week_dropdown', 'options')],
+    prevent_initial_call=True
+)
 
 # Radio -> multi
-@app.callback(Output('operator_selector', 'value'),
-              [Input('operator_dropdown', 'value')])
-def operator_radio_value(dropdown):
-    if dropdown == operator_options:
-        return 'all'
-    elif dropdown == []:
-        return 'none'
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='dropdown_value'),
+    Output('day_dropdown', 'value'),
+    [Input('day_selector', 'value'),
+    Input('day_dropdown', 'options')],
+    [State('day_dropdown','value')],
+    prevent_initial_call=True
+)
+
+# Radio -> multi, and "All operators" replacing or replaced by single operators
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='operator_value'),
+    Output('operator_dropdown', 'value'),
+    [Input('operator_selector', 'value'),
+    Input('operator_dropdown', 'value')],
+    prevent_initial_call=True
+)
+
+# Multi -> radio
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='radio_value'),
+    Output('day_selector', 'value'),
+    [Input('day_dropdown', 'value')],
+    [State('day_dropdown', 'options')],
+    prevent_initial_call=True
+)
+
+# Multi -> radio
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='operator_radio'),
+    Output('operator_selector', 'value'),
+    [Input('operator_dropdown', 'value')],
+    prevent_initial_call=True
+)
+
+# Compact encoding of total_graph
+
+# Points kept on total_graph, about its width in pixels
+TOTAL_GRAPH_POINTS = 1000
+
+# Resolutions of total_graph, the finest one giving at most TOTAL_GRAPH_POINTS
+# over the visible dates is plotted
+RESOLUTIONS = [('hour', MS_PER_HOUR), ('day', MS_PER_DAY), ('week', 7 * MS_PER_DAY)]
+
+def typed_array(values):
+    """Encode an array as a plotly.js typed array (base64 data, plotly.js >= 2.28)."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer) and len(values) and \
+            np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max:
+        values, dtype = values.astype('<i4'), 'i4'
     else:
-        return 'customized'
+        values, dtype = values.astype('<f8'), 'f8'
+    return {'dtype': dtype, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
 
-# callback for main_figure
-@app.callback(Output('total_graph', 'figure'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def make_main_figure(operator_selected, dayofweek, start_date,end_date):
+def downsample(x, y, threshold):
+    """Keep ``threshold`` points of a series with Largest-Triangle-Three-Buckets.
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    df_graph = dff.groupby(['Date','Year'])[['NumberFlights']].sum().reset_index()
-    df_2019 = df_graph.loc[df_graph['Year']==2019]
-    df_2020 = df_graph.loc[df_graph['Year']==2020]
-    df_lockdown_1 = df_graph[(df_graph['Date'] >= start_lockdown_1) & (df_graph['Date'] <= end_lockdown_1)]
-    df_lockdown_2 = df_graph[(df_graph['Date'] >= start_lockdown_2) & (df_graph['Date'] <= end_lockdown_2)]
+    The first and last points are kept, and in each bucket in between the
+    point forming the largest triangle with the previous point kept and the
+    average of the next bucket, which preserves the peaks of the series.
+    """
+    n = len(x)
+    if threshold < 3 or n <= threshold:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.append(edges, n)
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = a = 0
+    keep[-1] = n - 1
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_x = x[hi:edges[i + 2]].mean()
+        next_y = y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        keep[i + 1] = a = lo + int(area.argmax())
+    return keep
 
-    fig = go.Figure(data=[
-        go.Scatter(x=df_graph['Date'], y=df_graph['NumberFlights'],mode='lines',name='numberFlights',showlegend=False,line=dict(color="rgb(21, 127, 255)")),
-        go.Scatter(x=df_lockdown_1['Date'], y=df_lockdown_1['NumberFlights'],mode='lines', name='1st lockdown', line=dict(color="crimson"),),
-        go.Scatter(x=df_lockdown_2['Date'], y=df_lockdown_2['NumberFlights'],mode='lines', name='2nd lockdown', line=dict(color="darkorange"),)
-        ]
-    )
+def period_shapes(first, last):
+    # Periods shown as shaded ranges of the x axis instead of extra traces
+    shapes = []
+    annotations = []
+    for period in PERIODS:
+        if period['start'] > last or period['end'] < first:
+            continue
+        x0 = max(period['start'], first)
+        x1 = min(period['end'], last)
+        shapes.append(dict(type='rect', xref='x', yref='paper', x0=x0, x1=x1, y0=0, y1=1,
+                           fillcolor=period['color'], opacity=0.15, layer='below', line_width=0))
+        annotations.append(dict(x=x0, y=1, xref='x', yref='paper', text=period['name'], showarrow=False,
+                                xanchor='left', yanchor='bottom', font=dict(color=period['color'])))
+    return shapes, annotations
+
+def zoom_window(relayout):
+    """Dates shown by total_graph after a relayout.
+
+    None when the x axis went back to its whole range, False when the
+    relayout did not touch the x axis (e.g. the initial autosize).
+    """
+    relayout = relayout or {}
+    if relayout.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        window = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        window = relayout['xaxis.range']
+    else:
+        return False
+    return tuple(pd.Timestamp(x) for x in window)
+
+def main_figure(selection, window=None):
+    # Whole selection, or the dates in the window and the points just outside
+    # it so that the line reaches the edges of the graph
+    if window is not None:
+        lo, hi = (x.value // 10**6 for x in window)
+    elif len(selection.daily):
+        lo = selection.daily['Date'].iloc[0].value // 10**6
+        hi = selection.daily['Date'].iloc[-1].value // 10**6 + MS_PER_DAY
+    else:
+        lo = hi = 0
+    resolution = next((name for name, step in RESOLUTIONS if (hi - lo) / step <= TOTAL_GRAPH_POINTS),
+                      RESOLUTIONS[-1][0])
+    times, flights = selection.series(resolution)
+    if window is not None:
+        first, last = np.searchsorted(times, [lo, hi])
+        times = times[max(first - 1, 0):last + 1]
+        flights = flights[max(first - 1, 0):last + 1]
+    # Only many years of weeks still need downsampling
+    keep = downsample(times, flights, TOTAL_GRAPH_POINTS)
+    times, flights = times[keep], flights[keep]
+
+    fig = go.Figure()
     fig.update_layout(template='none',
                         paper_bgcolor='#fafafa',
                         plot_bgcolor='#fafafa',
                         margin=dict(l=50, r=40, t=70, b=70),
+                        xaxis=dict(type='date'),
+                        yaxis=dict(title='Flights per %s' % resolution),
                         )
-    fig.update_layout(legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=1.02,
-                        xanchor="right",
-                        x=1),
-                        )
-    return fig
+    if window is not None:
+        fig.update_xaxes(range=[window[0], window[1]], autorange=False)
+    if len(times):
+        first, last = (pd.Timestamp(x, unit='ms') for x in (times[0], times[-1]))
+        shapes, annotations = period_shapes(first, last)
+        fig.update_layout(shapes=shapes, annotations=annotations)
 
+    # Dates are sent as milliseconds since epoch, which a date axis reads as is
+    figure = fig.to_dict()
+    figure['data'] = [dict(
+        type='scatter',
+        x=typed_array(times),
+        y=typed_array(flights),
+        mode='lines',
+        name='numberFlights',
+        showlegend=False,
+        line=dict(color="rgb(21, 127, 255)"),
+    )]
+    return figure
 
-# callback for week_figure
-@app.callback(Output('week_graph', 'figure'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('year_week_dropdown', 'value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def make_week_figure(operator_selected, dayofweek, year, start_date,end_date):
+# make main_figure
+@cached_render
+def make_main_figure(operator_selected, dayofweek, start_date,end_date):
+    return main_figure(get_selection(operator_selected, dayofweek, start_date, end_date))
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
+# total_graph zoomed in or out, not cached: a window is rarely seen twice
+def make_zoom_figure(operator_selected, dayofweek, window, start_date, end_date):
+    selection = get_selection(operator_selected, dayofweek, start_date, end_date)
+    with phase('figure'):
+        return main_figure(selection, window)
 
-    dff = dff[dff['Year'] == year]
-    df_lockdown_1 = dff[(dff['Date'] >= start_lockdown_1) & (dff['Date'] <= end_lockdown_1)]
-    df_lockdown_2 = dff[(dff['Date'] >= start_lockdown_2) & (dff['Date'] <= end_lockdown_2)]
+# make week_figure
+@cached_render
+def make_week_figure(operator_selected, dayofweek, year, start_date,end_date):
 
-    cond = dff['Date'].isin(df_lockdown_1['Date'])
-    dff.drop(dff[cond].index, inplace = True)
-    cond = dff['Date'].isin(df_lockdown_2['Date'])
-    dff.drop(dff[cond].index, inplace = True)
+    dff = get_selection(operator_selected, dayofweek, start_date, end_date).daily
 
-    df_lockdown_1 = df_lockdown_1.groupby([df_lockdown_1['WeekNumber']])[['NumberFlights']].sum().reset_index()
-    df_lockdown_2 = df_lockdown_2.groupby([df_lockdown_2['WeekNumber']])[['NumberFlights']].sum().reset_index()
-    df_graph = dff.groupby(['WeekNumber','Year'])[['NumberFlights']].sum().reset_index()
-    #df_2020 = df_graph.loc[df_graph['Year']==2020]
+    # Flights per (period, week) of the ISO year, one stacked bar trace per period
+    df_graph = dff.loc[dff['ISOYear'] == year].groupby(['Period','WeekNumber'])['NumberFlights'].sum()
+    period = df_graph.index.get_level_values('Period')
+    bars = [('regular', 'rgb(21, 127, 255)')] + [(p['name'], p['color']) for p in PERIODS]
 
     fig = go.Figure(data=[
-        go.Bar(x=df_graph['WeekNumber'], y=df_graph['NumberFlights'], name='regular',marker_color='rgb(21, 127, 255)'),
-        go.Bar(x=df_lockdown_1['WeekNumber'], y=df_lockdown_1['NumberFlights'], name='1st lockdown',marker_color='crimson'),
-        go.Bar(x=df_lockdown_2['WeekNumber'], y=df_lockdown_2['NumberFlights'], name = '2nd lockdown', marker_color='darkorange')
+        go.Bar(x=df_graph[period == code].index.get_level_values('WeekNumber'),
+               y=df_graph[period == code].values, name=name, marker_color=color)
+        for code, (name, color) in enumerate(bars)
         ]
     )
     fig.update_layout(uniformtext_minsize=8, 
@@ -508,17 +2136,11 @@ def make_week_figure(operator_selected, dayofweek, year, start_date,end_date):
     )
     return fig
 
-# callback for hour_figure
-@app.callback(Output('hour_graph', 'figure'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
+# make hour_figure
+@cached_render
 def make_hour_figure(operator_selected, dayofweek, start_date,end_date):
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    df_graph = dff.groupby(['WeekNumber','DayOfWeek','Hour']).sum().reset_index()
-    df_hour = df_graph.groupby(['Hour'])[['NumberFlights']].mean().reset_index().round(decimals=2)
+    df_hour = get_selection(operator_selected, dayofweek, start_date, end_date).hour_means().round(decimals=2)
 
     fig = go.Figure(
         data=
@@ -538,17 +2160,13 @@ def make_hour_figure(operator_selected, dayofweek, start_date,end_date):
                         )
     return fig
 
-# callback for weekday_figure
-@app.callback(Output('weekday_graph', 'figure'),
-              [Input('operator_dropdown', 'value'),
-              Input('day_dropdown','value'),
-              Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
+# make weekday_figure
+@cached_render
 def make_dayofweek_figure(operator_selected, dayofweek, start_date,end_date):
 
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    df_graph = dff.groupby(['WeekNumber','DayOfWeek'])[['NumberFlights']].sum().reset_index()
-    test = df_graph.groupby('DayOfWeek').mean().reset_index().round(decimals=2)
+    test = get_selection(operator_selected, dayofweek, start_date, end_date).dayofweek_means()
+    # Slices in name order, which sets their colors
+    test = test.sort_values('DayOfWeek').round(decimals=2)
     fig = px.pie(test, values='NumberFlights', names='DayOfWeek')
     fig.update_traces(textposition='inside', textinfo='percent+label',textfont_size=15)
     fig.update_layout(uniformtext_minsize=8, 
@@ -562,25 +2180,534 @@ def make_dayofweek_figure(operator_selected, dayofweek, start_date,end_date):
 
     return fig
 
-# callback for data_table
-@app.callback(Output('data_table', 'data'),
+# make data_table
+
+# Operators of the filter queries of DataTable, as written in the query and as
+# the method of pandas.Series applying them
+FILTER_OPERATORS = {
+    '>=': 'ge', 'ge': 'ge',
+    '<=': 'le', 'le': 'le',
+    '<': 'lt', 'lt': 'lt',
+    '>': 'gt', 'gt': 'gt',
+    '!=': 'ne', 'ne': 'ne',
+    '=': 'eq', 'eq': 'eq',
+    'contains': 'contains',
+}
+
+# '{column} op value', the operator read right after the column so that the
+# same words in a quoted value are left alone. DataTable may prefix it with s
+# or i (case sensitive or not), words are followed by a space
+FILTER_PART = re.compile(r'\{(.+?)\}\s*[si]?(>=|<=|!=|<|>|=|(?:ge|le|lt|gt|ne|eq|contains)(?=\s))\s*(.*)', re.S)
+
+def split_filter_part(part):
+    # '{column} op value' into the column, the operator and the value
+    match = FILTER_PART.match(part.strip())
+    if match is None:
+        return None, None, None
+    name, word, value = match.groups()
+    operator = FILTER_OPERATORS[word]
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+        value = value[1:-1].replace('\\' + value[0], value[0])
+    elif operator != 'contains':
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return name, operator, value
+
+def filter_table(table, filter_query):
+    for part in (filter_query or '').split(' && '):
+        name, operator, value = split_filter_part(part)
+        if name not in table:
+            continue
+        column = table[name]
+        if operator == 'contains':
+            mask = column.astype(str).str.contains(str(value), case=False, regex=False) & column.notna()
+        else:
+            try:
+                mask = getattr(column, operator)(value)
+            except TypeError:
+                # e.g. a number compared with text: nothing matches
+                mask = np.zeros(len(table), dtype=bool)
+        table = table[mask]
+    return table
+
+def table_sort_key(sort_by):
+    # sort_by of DataTable as a hashable key of the render cache
+    return tuple((s['column_id'], s['direction']) for s in sort_by or [])
+
+@cached_render
+def make_data_table(operator_selected, dayofweek, page_current, page_size, sort_key, filter_query, start_date,end_date):
+
+    df_final = get_selection(operator_selected, dayofweek, start_date, end_date).operator_table()
+    df_final = filter_table(df_final, filter_query)
+    if sort_key:
+        df_final = df_final.sort_values([column for column, _ in sort_key],
+                                         ascending=[direction == 'asc' for _, direction in sort_key],
+                                         na_position='last')
+
+    # Back to the last page when the selection has fewer rows than before
+    page_count = max(1, -(-len(df_final) // page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    data = df_final.iloc[page_current * page_size:(page_current + 1) * page_size].to_dict('records')
+
+    return data, page_count, page_current
+
+# Counters of the info boxes, cached like the figures so that a view computed
+# by a job is known to be complete
+@cached_render
+def make_counters(operator_selected, dayofweek, start_date, end_date):
+    selection = get_selection(operator_selected, dayofweek, start_date, end_date)
+    return selection.nb_operators, selection.nb_flights, selection.nb_days
+
+# Jobs of the dashboard: a job is a single task of the pool, so that its
+# outputs share one selection, which writes each output to JOB_DIR as soon as
+# it is done for the page to show it along with the progress. A newer
+# selection from the same page cancels its previous job, which stops before
+# its next output.
+#
+# The page keeps the state of its job (see job_state), so that any worker
+# process can serve its polls: one that does not run the job starts it again
+# under the same id, which reads the outputs already written by the other and
+# only computes the missing ones.
+
+# Outputs in the order they are computed, and the outputs of update_dashboard
+# each one fills
+JOB_TASKS = OrderedDict([
+    ('selection', [4, 5, 6]),
+    ('main', [0]),
+    ('dayofweek', [3]),
+    ('week', [1]),
+    ('hour', [2]),
+    ('table', [7, 8, 9]),
+])
+TASK_RENDERS = {
+    'selection': make_counters,
+    'main': make_main_figure,
+    'dayofweek': make_dayofweek_figure,
+    'week': make_week_figure,
+    'hour': make_hour_figure,
+    'table': make_data_table,
+}
+# Jobs of which no page asked the result for that many seconds are dropped,
+# along with their outputs
+JOB_EXPIRY = 60
+# Outputs of the jobs, shared by the worker processes of the server
+JOB_DIR = os.environ.get('JOB_DIR') or os.path.join(DATA_CACHE_DIR or tempfile.gettempdir(), 'jobs')
+
+def task_args(name, operator_selected, dayofweek, year, start_date, end_date, *table_state):
+    if name == 'week':
+        return operator_selected, dayofweek, year, start_date, end_date
+    if name == 'table':
+        return (operator_selected, dayofweek) + table_state + (start_date, end_date)
+    return operator_selected, dayofweek, start_date, end_date
+
+def run_task(name, *inputs):
+    """Compute the outputs of a task, in a pool process or in the request."""
+    values = TASK_RENDERS[name](*task_args(name, *inputs))
+    return values if len(JOB_TASKS[name]) > 1 else (values,)
+
+def task_cached(name, *inputs):
+    return TASK_RENDERS[name].cache_key(*task_args(name, *inputs)) in render_cache
+
+def task_path(job_id, name):
+    return os.path.join(JOB_DIR, '%s.%s.pickle' % (job_id, name))
+
+def read_task(job_id, name):
+    """(values, timing, data tag) of a task of a job, None if not done yet."""
+    try:
+        with open(task_path(job_id, name), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+def run_job(number, job_id, inputs, names):
+    """Compute the tasks of a job in a pool process, writing their outputs one by one."""
+    slot = number % JOB_SLOTS
+    for name in names:
+        if _job_flags[slot] != number:
+            return
+        path = task_path(job_id, name)
+        # Written by the same job in another worker process
+        if os.path.exists(path):
+            continue
+        # Timed here, recorded by the poll delivering the outputs (see add_timing)
+        timing = _timing.current = CallbackTiming(name)
+        try:
+            values = run_task(name, *inputs)
+        except Exception:
+            logger.exception('Task %s failed', name)
+            values = None
+        finally:
+            timing.charge()
+            _timing.current = None
+        temp = '%s.%d' % (path, os.getpid())
+        with open(temp, 'wb') as f:
+            pickle.dump((values, timing, dataset.tag), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+
+class Job:
+    _numbers = iter(range(1, 2**62))
+
+    def __init__(self, job_id, started, inputs, names):
+        self.id = job_id
+        self.number = next(self._numbers)
+        self.started = started
+        self.inputs = inputs
+        self.names = names
+        self.future = None
+        self.seen = time.monotonic()
+
+    def cancel(self):
+        # A job not started yet is dropped, a running one stops before its next task
+        self.future.cancel()
+        _job_flags[self.number % JOB_SLOTS] = 0
+
+    def failed(self):
+        return self.future.done() and not self.future.cancelled() and self.future.exception() is not None
+
+# Current job of each page
+_jobs = {}
+
+def job_state(job, delivered=()):
+    """State of a job kept by the page, in the job store."""
+    return {'id': job.id, 'started': job.started, 'inputs': job.inputs, 'delivered': sorted(delivered)}
+
+def state_inputs(state):
+    # The sort key of the table comes back from the page as lists
+    inputs = list(state['inputs'])
+    inputs[7] = tuple(tuple(column) for column in inputs[7])
+    return tuple(inputs)
+
+def remove_old_tasks():
+    now = time.time()
+    try:
+        names = os.listdir(JOB_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(JOB_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > JOB_EXPIRY:
+                os.remove(path)
+        except OSError:
+            pass
+
+def start_job(session_id, inputs, state=None):
+    """Start a job for the page, or the job of its state if another worker started it."""
+    global _job_pool
+    remove_old_tasks()
+    os.makedirs(JOB_DIR, exist_ok=True)
+    delivered = set(state['delivered']) if state else set()
+    with _job_lock:
+        previous = _jobs.pop(session_id, None)
+        if previous is not None:
+            previous.cancel()
+        now = time.monotonic()
+        for key in [key for key, job in _jobs.items() if now - job.seen > JOB_EXPIRY]:
+            _jobs.pop(key).cancel()
+        # Outputs already cached are served by the first poll
+        names = [name for name in JOB_TASKS if name not in delivered and not task_cached(name, *inputs)]
+        if state:
+            job = Job(state['id'], state['started'], inputs, names)
+        else:
+            job = Job(uuid.uuid4().hex, time.time(), inputs, names)
+        try:
+            pool = job_pool()
+            _job_flags[job.number % JOB_SLOTS] = job.number
+            job.future = pool.submit(run_job, job.number, job.id, inputs, job.names)
+        except BrokenProcessPool:
+            logger.exception('Job pool broken, computing in the request')
+            _job_pool = None
+            return None
+        _jobs[session_id] = job
+    return job
+
+def job_progress(delivered):
+    if len(delivered) == len(JOB_TASKS):
+        return ''
+    return 'Computing... %d/%d' % (len(delivered), len(JOB_TASKS))
+
+def task_key(name, inputs):
+    # Equal for the inputs of a job given back by the page
+    return json.dumps(task_args(name, *inputs), default=str)
+
+def poll_job(session_id, state, inputs):
+    """Outputs of the tasks of a job done since the last poll of the page, None if superseded."""
+    with _job_lock:
+        job = _jobs.get(session_id)
+        if job is not None and job.id != state['id'] and job.started > state['started']:
+            return None
+    if job is None or job.id != state['id']:
+        # Started by another worker process, or dropped since
+        job = start_job(session_id, state_inputs(state), state)
+        if job is None:
+            return compute_dashboard(*inputs) + (None, True, '')
+    job.seen = time.monotonic()
+
+    failed = job.failed()
+    if failed:
+        logger.error('Job failed, computing it in the request', exc_info=job.future.exception())
+    delivered = set(state['delivered'])
+    outputs = [dash.no_update] * DASHBOARD_OUTPUTS
+    for name in JOB_TASKS:
+        if name in delivered:
+            continue
+        values = None
+        if name in job.names:
+            result = read_task(job.id, name)
+            if result is None and not failed:
+                continue
+            if result is not None:
+                values, timing, tag = result
+                add_timing(timing)
+                if values is not None and tag == dataset.tag:
+                    # Keep the results for the views seen again, unless new data came in
+                    value = values if len(values) > 1 else values[0]
+                    render_cache.get(TASK_RENDERS[name].cache_key(*task_args(name, *job.inputs)), lambda: value)
+        # Cached when the job started, or left undone by a failed job: computed in the request
+        if values is None:
+            values = run_task(name, *job.inputs)
+        delivered.add(name)
+        # Not wanted anymore, e.g. the week figure of a year the page has moved away from
+        if task_key(name, job.inputs) != task_key(name, inputs):
+            continue
+        for slot, value in zip(JOB_TASKS[name], values):
+            outputs[slot] = value
+    progress = job_progress(delivered)
+    return tuple(outputs) + (job_state(job, delivered), not progress, progress)
+
+def compute_dashboard(*inputs):
+    outputs = [None] * DASHBOARD_OUTPUTS
+    for name, slots in JOB_TASKS.items():
+        for slot, value in zip(slots, run_task(name, *inputs)):
+            outputs[slot] = value
+    return tuple(outputs)
+
+# One callback renders the whole dashboard, so that an interaction costs a
+# single request and every output reads the same selection
+@app.callback([Output('total_graph', 'figure'),
+              Output('week_graph', 'figure'),
+              Output('hour_graph', 'figure'),
+              Output('weekday_graph', 'figure'),
+              Output('nb_operator', 'children'),
+              Output('nb_flights', 'children'),
+              Output('nb_days', 'children'),
+              Output('data_table', 'data'),
+              Output('data_table', 'page_count'),
+              Output('data_table', 'page_current'),
+              Output('job', 'data'),
+              Output('job_interval', 'disabled'),
+              Output('job_progress', 'children')],
               [Input('operator_dropdown', 'value'),
               Input('day_dropdown','value'),
+              Input('year_week_dropdown', 'value'),
               Input('date_picker_range', 'start_date'),
-              Input('date_picker_range', 'end_date')])
-def make_data_table(operator_selected, dayofweek, start_date,end_date):
-
-    dff = filter_dataframe(df, operator_selected, dayofweek, start_date, end_date)
-    df_ope = dff.groupby(['Operator'])[['NumberFlights']].sum().sort_values(by=['NumberFlights'],ascending=False)
-    df_model = dff.groupby(['Operator','Model'])[['NumberFlights']].sum().sort_values(by=['NumberFlights'],ascending=False).reset_index()
-    df_manuf = dff.groupby(['Operator','Manufacturer'])[['NumberFlights']].sum().sort_values(by=['NumberFlights'],ascending=False).reset_index()
-    df_model = df_model.drop_duplicates(subset='Operator').set_index('Operator')
-    df_manuf = df_manuf.drop_duplicates(subset='Operator').set_index('Operator')
-    df_final = df_ope.join(df_model['Model']).join(df_manuf['Manufacturer']).reset_index()
-    df_final.columns = ['Operator','Total No. of flights','Most used aircraft','Favorite manufacturer']
-    data = df_final.to_dict('records')
-
-    return data
+              Input('date_picker_range', 'end_date'),
+              Input('data_version', 'data'),
+              Input('data_table', 'page_current'),
+              Input('data_table', 'sort_by'),
+              Input('data_table', 'filter_query'),
+              Input('job_interval', 'n_intervals'),
+              Input('total_graph', 'relayoutData')],
+              [State('job', 'data'),
+              State('session_id', 'data'),
+              State('data_table', 'page_size')],
+              prevent_initial_call=True)
+@instrumented
+def update_dashboard(operator_selected, dayofweek, year, start_date, end_date, data_version,
+                     page_current=0, sort_by=None, filter_query='', n_intervals=None, relayout=None,
+                     job=None, session_id=None, page_size=TABLE_PAGE_SIZE):
+    inputs = (operator_selected, dayofweek, year, start_date, end_date,
+              page_current, page_size or TABLE_PAGE_SIZE, table_sort_key(sort_by), filter_query)
+    triggered = []
+    if flask.has_request_context():
+        triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+
+    if triggered == ['job_interval.n_intervals']:
+        if not job:
+            raise PreventUpdate
+        outputs = poll_job(session_id, job, inputs)
+        if outputs is None:
+            # Superseded by a newer job of the page
+            raise PreventUpdate
+        return outputs
+
+    # Picking another year only changes the week figure
+    if triggered == ['year_week_dropdown.value']:
+        week_figure = make_week_figure(operator_selected, dayofweek, year, start_date, end_date)
+        return (dash.no_update, week_figure) + (dash.no_update,) * 11
+
+    # Zooming total_graph re-aggregates it at the resolution of the new window
+    if triggered == ['total_graph.relayoutData']:
+        window = zoom_window(relayout)
+        if window is False:
+            raise PreventUpdate
+        if window is None:
+            figure = make_main_figure(operator_selected, dayofweek, start_date, end_date)
+        else:
+            figure = make_zoom_figure(operator_selected, dayofweek, window, start_date, end_date)
+        return (figure,) + (dash.no_update,) * 12
+
+    # Paging, sorting or filtering the table only changes the table
+    if triggered and all(t.startswith('data_table.') for t in triggered):
+        return (dash.no_update,) * 7 + run_task('table', *inputs) + (dash.no_update,) * 3
+
+    # Views already cached are served right away
+    if (JOB_WORKERS and triggered and session_id
+            and not all(task_cached(name, *inputs) for name in JOB_TASKS)):
+        started = start_job(session_id, inputs)
+        if started is not None:
+            return (dash.no_update,) * DASHBOARD_OUTPUTS + (job_state(started), False, job_progress(()))
+    return compute_dashboard(*inputs) + (None, True, '')
+
+# JSON API
+#
+# The aggregates of the dashboard for other services, e.g.
+#   /api/v1/daily?operator=Air%20France&day=Monday&day=Friday&start_date=2020-03-01
+# operator and day can be repeated and default to all of them, the dates to
+# the whole calendar. Responses carry an ETag of the data and the filters,
+# so that polling clients get a 304 until new flights come in.
+
+API_CACHE_BYTES = int(os.environ.get('API_CACHE_MB', 16)) * 2**20
+
+# Encoded responses by (ETag, content coding)
+api_cache = LRUCache(256, API_CACHE_BYTES, sizeof=len)
+
+def api_filters(args, data):
+    """Arguments of filter_dataframe from the query string, ValueError if invalid."""
+    operators = args.getlist('operator') or [ALL_OPERATORS]
+    days = args.getlist('day') or weekdays
+    unknown = sorted(set(days) - set(weekdays))
+    if unknown:
+        raise ValueError('unknown day: %s' % ', '.join(unknown))
+    start_date = pd.Timestamp(args.get('start_date', data.start_date))
+    end_date = pd.Timestamp(args.get('end_date', data.end_date))
+    # An empty date parses as NaT
+    for name, date in (('start_date', start_date), ('end_date', end_date)):
+        if pd.isna(date):
+            raise ValueError('invalid %s: %r' % (name, args.get(name)))
+    return operators, days, start_date, end_date
+
+def api_daily(selection, year):
+    return selection.daily[['Date', 'Year', 'WeekNumber', 'DayOfWeek', 'NumberFlights']]
+
+def api_weekly(selection, year):
+    # Bars of week_graph, for every year unless one is given, the year being the one of the ISO week
+    daily = selection.daily if year is None else selection.daily.loc[selection.daily['ISOYear'] == year]
+    weekly = daily.groupby(['ISOYear', 'WeekNumber', 'Period'])['NumberFlights'].sum().reset_index()
+    weekly = weekly.rename(columns={'ISOYear': 'Year'})
+    weekly['Period'] = np.asarray(['regular'] + [p['name'] for p in PERIODS], dtype=object)[weekly['Period']]
+    return weekly
+
+def api_hourly(selection, year):
+    return selection.hour_means()
+
+def api_weekday(selection, year):
+    means = selection.dayofweek_means()
+    means['Share'] = means['NumberFlights'] / means['NumberFlights'].sum()
+    return means
+
+def api_operators(selection, year):
+    return selection.operator_table()
+
+API_VIEWS = {
+    'daily': api_daily,
+    'weekly': api_weekly,
+    'hourly': api_hourly,
+    'weekday': api_weekday,
+    'operators': api_operators,
+}
+
+def api_encoding(request):
+    # Best content coding accepted by the client, brotli when installed
+    for encoding in ('br', 'gzip'):
+        if request.accept_encodings[encoding] and (encoding != 'br' or brotli is not None):
+            return encoding
+    return 'identity'
+
+def api_body(data, view, filters, year, encoding):
+    selection = get_selection(*filters, data=data)
+    records = API_VIEWS[view](selection, year).to_dict('records')
+    body = json.dumps({'filters': {'operator': filters[0], 'day': filters[1],
+                                   'start_date': filters[2], 'end_date': filters[3]},
+                       'data': records}, cls=plotly.utils.PlotlyJSONEncoder).encode()
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+@server.route('/api/v1/<view>')
+def api(view):
+    request = flask.request
+    if view not in API_VIEWS:
+        return flask.jsonify(error='unknown view, one of: %s' % ', '.join(API_VIEWS)), 404
+    # The body is computed from the dataset its ETag is taken from, even if
+    # new data comes in meanwhile
+    data = dataset
+    try:
+        filters = api_filters(request.args, data)
+        year = request.args.get('year')
+        year = None if year is None else int(year)
+    except ValueError as e:
+        return flask.jsonify(error=str(e)), 400
+
+    etag = hashlib.sha1(repr((data.tag, view, filter_key(*filters), year)).encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = flask.Response(status=304)
+    else:
+        encoding = api_encoding(request)
+        body = api_cache.get((etag, encoding), lambda: api_body(data, view, filters, year, encoding))
+        response = flask.Response(body, mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    # Weak, as the same tag is given to every content coding of the response
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Warm-up: the views most pages ask for are computed when the data is
+# loaded, before the server takes requests, then again by follow_data for
+# each new dataset (WARM_UP=0 to disable)
+WARM_UP = int(os.environ.get('WARM_UP', 1))
+
+def warm_up(data):
+    """Cache the default view, each year of the week figure and each period."""
+    start = time.perf_counter()
+    inputs = default_inputs(data)
+    compute_dashboard(*inputs)
+    operators, days = inputs[:2]
+    for year in data.years:
+        make_week_figure(operators, days, int(year), data.start_date, data.end_date)
+    for period in PERIODS:
+        start_date = max(pd.Timestamp(period['start']), data.start_date)
+        end_date = min(pd.Timestamp(period['end']), data.end_date)
+        if start_date <= end_date:
+            compute_dashboard(operators, days, end_date.isocalendar()[0], start_date, end_date, *inputs[5:])
+    logger.info('Warmed up the caches in %.2fs', time.perf_counter() - start)
+
+if WARM_UP:
+    warm_up(dataset)
+
+# Follow the data file once everything is defined, from the first request of
+# each process: threads do not survive fork, so gunicorn workers forked from
+# a --preload master start their own
+_follow_pid = None
+_follow_lock = threading.Lock()
+
+def start_following():
+    global _follow_pid
+    if _follow_pid != os.getpid():
+        with _follow_lock:
+            if _follow_pid != os.getpid():
+                _follow_pid = os.getpid()
+                threading.Thread(target=follow_data, args=(DATA_PATH, INGEST_POLL_INTERVAL), daemon=True).start()
+
+if INGEST_POLL_INTERVAL > 0:
+    server.before_request(start_following)
 
 #Main
 #if __name__ == '__main__':
@@ -38,3 +38,71 @@ var triggerResize = function() {
 // window.onload = function(){
 //   triggerResize();
 // }
+
+// Clientside callbacks syncing the radio items and the dropdowns of app.py
+var ALL_OPERATORS = '__all__';
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  clientside: {
+    // Last year of the week figure's dropdown
+    set_year_value: function(options) {
+      if (!options || options.length === 0) {
+        return window.dash_clientside.no_update;
+      }
+      return options[options.length - 1].value;
+    },
+
+    // Radio -> multi
+    dropdown_value: function(selector, options, prev_value) {
+      if (selector === 'all') {
+        return (options || []).map(function(option) { return option.value; });
+      } else if (selector === 'none') {
+        return [];
+      }
+      return prev_value;
+    },
+
+    // Multi -> radio
+    radio_value: function(dropdown, options) {
+      var selected = dropdown || [];
+      if (selected.length === 0) {
+        return 'none';
+      }
+      var values = new Set(selected);
+      var all = (options || []).every(function(option) { return values.has(option.value); });
+      return all ? 'all' : 'customized';
+    },
+
+    // Radio -> multi for the operators, where "All operators" is a single
+    // value (ALL_OPERATORS in app.py) rather than every option
+    operator_value: function(selector, dropdown) {
+      var triggered = window.dash_clientside.callback_context.triggered.map(function(t) { return t.prop_id; });
+      var selected = dropdown || [];
+      if (triggered.indexOf('operator_selector.value') >= 0) {
+        if (selector === 'all') {
+          return [ALL_OPERATORS];
+        } else if (selector === 'none') {
+          return [];
+        }
+        return window.dash_clientside.no_update;
+      }
+      if (selected.length > 1 && selected.indexOf(ALL_OPERATORS) >= 0) {
+        // Picking "All operators" replaces the operators, picking an operator replaces "All operators"
+        if (selected[selected.length - 1] === ALL_OPERATORS) {
+          return [ALL_OPERATORS];
+        }
+        return selected.filter(function(value) { return value !== ALL_OPERATORS; });
+      }
+      return window.dash_clientside.no_update;
+    },
+
+    // Multi -> radio for the operators
+    operator_radio: function(dropdown) {
+      var selected = dropdown || [];
+      if (selected.length === 0) {
+        return 'none';
+      }
+      return selected.indexOf(ALL_OPERATORS) >= 0 ? 'all' : 'customized';
+    }
+  }
+});
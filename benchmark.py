@@ -0,0 +1,232 @@
+# Benchmark of the dashboard on synthetic data
+#
+# Generates flight files in the same 7-column TSV layout as data-plane.csv,
+# then for each size times the load-and-clean step, filter_dataframe and
+# every render function of app.py under representative filters. Each size
+# runs in its own process so that its peak RSS can be reported.
+#
+#   python benchmark.py --rows 100000 1000000 10000000 --operators 300
+#
+# Results are written as JSON (see --output) and can be compared with a
+# previous run with --baseline.
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+MANUFACTURERS = {
+    'Airbus': ['A318', 'A319', 'A320', 'A321', 'A330', 'A350', 'A380'],
+    'Boeing': ['B737', 'B747', 'B767', 'B777', 'B787'],
+    'ATR': ['ATR42', 'ATR72'],
+    'Embraer': ['E170', 'E190', 'E195'],
+    'Bombardier': ['CRJ700', 'CRJ900', 'Q400'],
+}
+
+FUNCTIONS = ['make_main_figure', 'make_week_figure', 'make_hour_figure',
+             'make_dayofweek_figure', 'make_data_table']
+
+
+def generate(path, rows, operators, days, seed=0, chunk=10**6):
+    """Write ``rows`` random flights over ``days`` days starting on 2019-01-01.
+
+    Operators follow a Zipf-like popularity so that a "top 10" selection is
+    meaningful, about 1% of the hours are not numbers and one line in 10^5
+    has an extra field, as the pipeline's output sometimes does.
+    """
+    rng = np.random.default_rng(seed)
+    models = [(manufacturer, model) for manufacturer, values in MANUFACTURERS.items() for model in values]
+    names = np.array(['OP%04d' % i for i in range(operators)])
+    weights = 1 / np.arange(1, operators + 1)
+    weights /= weights.sum()
+    dates = pd.date_range('2019-01-01', periods=days).strftime('%Y-%m-%d').to_numpy()
+    hours = np.array([str(h) for h in range(24)] + ['NaN'], dtype=object)
+    hour_weights = np.append(np.full(24, 0.99 / 24), 0.01)
+
+    with open(path, 'w') as f:
+        for start in range(0, rows, chunk):
+            n = min(chunk, rows - start)
+            model = rng.integers(len(models), size=n)
+            lines = pd.DataFrame({
+                'id': np.arange(start, start + n),
+                'date': dates[np.sort(rng.integers(days, size=n))],
+                'hour': hours[rng.choice(len(hours), size=n, p=hour_weights)],
+                'manufacturer': [models[m][0] for m in model],
+                'model': [models[m][1] for m in model],
+                'operator': names[rng.choice(operators, size=n, p=weights)],
+                'flights': rng.integers(1, 6, size=n),
+            })
+            lines.to_csv(f, sep='\t', header=False, index=False)
+            for _ in range(n // 10**5):
+                f.write('%d\tbad\tline\twith\tan\textra\tfield\t!\n' % start)
+
+
+def json_size(value):
+    # Bytes of the JSON Dash sends for an output
+    import plotly.utils
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'n': len(samples),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p90_ms': round(float(np.percentile(samples, 90)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def run_one(path, repeat):
+    """Benchmark one data file, in a process of its own."""
+    os.environ['DATA_PLANE_PATH'] = path
+    os.environ['INGEST_POLL_INTERVAL'] = '0'
+    os.environ['DATA_CACHE_DIR'] = ''
+    # Every sample starts cold anyway
+    os.environ['WARM_UP'] = '0'
+    import app
+
+    result = {'rows': None, 'timings': {}, 'payload_bytes': {}}
+
+    # Load and clean, the way the app does at startup without a store
+    samples = []
+    for _ in range(max(1, repeat // 10)):
+        start = time.perf_counter()
+        rows, offset = app.read_data(path)
+        data = app.Dataset.from_frame(rows, offset)
+        samples.append(time.perf_counter() - start)
+    result['timings']['load'] = {'all': percentiles(samples)}
+    result['rows'] = len(data.df)
+    app.dataset = data
+
+    # As the dashboard sends it when every operator is selected
+    operators = [app.ALL_OPERATORS]
+    top10 = data.df.groupby('Operator', observed=True)['NumberFlights'].sum().nlargest(10).index.tolist()
+    filters = {
+        'all': (operators, app.weekdays, data.start_date, data.end_date),
+        'top10': (top10, app.weekdays, data.start_date, data.end_date),
+        'weekdays': (operators, app.weekdays[:5], data.start_date, data.end_date),
+        'lockdown_1': (operators, app.weekdays, app.start_lockdown_1, app.end_lockdown_1),
+        'lockdown_2': (operators, app.weekdays, app.start_lockdown_2, app.end_lockdown_2),
+    }
+
+    def measure(name, label, call):
+        samples = []
+        for _ in range(repeat):
+            # Every sample starts cold, as a filter state seen for the first time
+            app.invalidate_caches()
+            start = time.perf_counter()
+            value = call()
+            samples.append(time.perf_counter() - start)
+        result['timings'].setdefault(name, {})[label] = percentiles(samples)
+        return value
+
+    for label, (ops, days, start_date, end_date) in filters.items():
+        measure('filter_dataframe', label, lambda: app.filter_dataframe(data.df, ops, days, start_date, end_date))
+        measure('selection', label, lambda: app.get_selection(ops, days, start_date, end_date))
+        for name in FUNCTIONS:
+            func = getattr(app, name)
+            if name == 'make_week_figure':
+                call = lambda: func(ops, days, pd.Timestamp(end_date).year, start_date, end_date)
+            elif name == 'make_data_table':
+                # First page in the default order, as after a change of the filters
+                call = lambda: func(ops, days, 0, app.TABLE_PAGE_SIZE, (), '', start_date, end_date)
+            else:
+                call = lambda: func(ops, days, start_date, end_date)
+            value = measure(name, label, call)
+            result['payload_bytes'].setdefault(name, {})[label] = json_size(value)
+        value = measure('update_dashboard', label,
+                        lambda: app.update_dashboard(ops, days, pd.Timestamp(end_date).year, start_date, end_date, None))
+        result['payload_bytes'].setdefault('update_dashboard', {})[label] = json_size(value)
+
+    # ru_maxrss is in kilobytes on Linux
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    # Ratio of the median latencies, > 1 meaning slower than the baseline
+    previous = {(r['rows'], r['operators']): r for r in baseline['results']}
+    for result in results:
+        old = previous.get((result['rows'], result['operators']))
+        if old is None:
+            continue
+        print('%d rows, %d operators' % (result['rows'], result['operators']))
+        for name, labels in result['timings'].items():
+            for label, stats in labels.items():
+                old_stats = old['timings'].get(name, {}).get(label)
+                if old_stats and old_stats['p50_ms'] > 0:
+                    print('  %-22s %-11s %8.2f ms  x%.2f' % (name, label, stats['p50_ms'],
+                                                             stats['p50_ms'] / old_stats['p50_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the dashboard on synthetic data')
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e5, 1e6],
+                        help='sizes of the generated files, in rows')
+    parser.add_argument('--operators', type=int, default=300, help='number of operators')
+    parser.add_argument('--days', type=int, default=730, help='number of days, starting on 2019-01-01')
+    parser.add_argument('--repeat', type=int, default=20, help='samples per measurement')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'integrateur-benchmark'),
+                        help='folder of the generated files, reused between runs')
+    parser.add_argument('--output', default='benchmark-results.json', help='JSON file of the results')
+    parser.add_argument('--baseline', help='results of a previous run to compare with')
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        json.dump(run_one(args.run_one, args.repeat), sys.stdout)
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        rows = int(rows)
+        path = os.path.join(args.data_dir, 'flights-%d-%d-%d.tsv' % (rows, args.operators, args.days))
+        if not os.path.exists(path):
+            print('Generating %s' % path)
+            generate(path + '.tmp', rows, args.operators, args.days)
+            os.rename(path + '.tmp', path)
+        print('Benchmarking %d rows' % rows)
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--run-one', path,
+                                          '--repeat', str(args.repeat)])
+        result = json.loads(output)
+        result.update(rows=rows, operators=args.operators, days=args.days, file_bytes=os.path.getsize(path))
+        results.append(result)
+
+    report = {
+        'commit': git_commit(),
+        'date': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Results written to %s' % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# The app loads its data when it is imported: point it to a small synthetic
+# file first, without the store, the background jobs or the ingest thread.
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmark import generate
+
+DATA_DIR = tempfile.mkdtemp(prefix='integrateur-tests-')
+DATA_PATH = os.path.join(DATA_DIR, 'data-plane.csv')
+# 2019-01-01 to 2020-02-04, across the first ISO week of 2020
+generate(DATA_PATH, rows=20000, operators=40, days=400, seed=1)
+
+os.environ['DATA_PLANE_PATH'] = DATA_PATH
+os.environ['DATA_CACHE_DIR'] = ''
+os.environ['INGEST_POLL_INTERVAL'] = '0'
+os.environ['JOB_WORKERS'] = '0'
+os.environ['WARM_UP'] = '0'
@@ -0,0 +1,43 @@
+import gzip
+import json
+
+import app
+
+
+def get(path, **headers):
+    return app.server.test_client().get(path, headers=headers)
+
+
+def test_etag_round_trip():
+    response = get('/api/v1/daily?day=Monday')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert json.loads(response.data)['filters']['day'] == ['Monday']
+
+    again = get('/api/v1/daily?day=Monday', **{'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    other = get('/api/v1/daily?day=Tuesday', **{'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['ETag'] != etag
+
+
+def test_gzip():
+    plain = get('/api/v1/operators')
+    compressed = get('/api/v1/operators', **{'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_errors():
+    assert get('/api/v1/monthly').status_code == 404
+    assert get('/api/v1/daily?day=Funday').status_code == 400
+    assert get('/api/v1/weekly?year=next').status_code == 400
+    assert get('/api/v1/daily?start_date=soon').status_code == 400
+    assert get('/api/v1/daily?start_date=').status_code == 400
+    assert get('/api/v1/daily?end_date=').status_code == 400
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import numpy as np
+
+import app
+
+
+def test_concurrent_gets_compute_once():
+    cache = app.LRUCache(10)
+    calls = []
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    threads = [threading.Thread(target=cache.get, args=('key', compute)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.get('key', compute) == 'value'
+    assert len(calls) == 1
+
+
+def test_bytes_budget():
+    cache = app.LRUCache(10, max_bytes=100, sizeof=len)
+    cache.get('a', lambda: 'x' * 60)
+    cache.get('b', lambda: 'x' * 60)
+    assert 'a' not in cache and 'b' in cache
+    # Too big to be kept at all
+    cache.get('c', lambda: 'x' * 200)
+    assert 'c' not in cache and 'b' in cache
+
+
+def test_failed_compute_not_pending():
+    cache = app.LRUCache(10)
+    def fail():
+        raise ValueError
+    for _ in range(2):
+        try:
+            cache.get('key', fail)
+        except ValueError:
+            pass
+    assert cache.get('key', lambda: 1) == 1
+
+
+def test_value_size():
+    figure = {'data': [{'x': np.arange(100, dtype=np.int64), 'y': [1.5] * 10}], 'layout': {'title': 'abc'}}
+    assert 800 < app.value_size(figure) < 1000
@@ -0,0 +1,25 @@
+import numpy as np
+
+import app
+
+
+def test_short_series_kept():
+    x = np.arange(10)
+    assert app.downsample(x, x * 2, 10).tolist() == list(range(10))
+    assert app.downsample(x, x * 2, 2).tolist() == list(range(10))
+    assert app.downsample([], [], 5).tolist() == []
+
+
+def test_downsample():
+    rng = np.random.default_rng(0)
+    x = np.arange(5000)
+    y = rng.normal(100, 5, size=len(x))
+    y[1234] = 1000
+    y[4321] = -1000
+    keep = app.downsample(x, y, 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    # The peaks survive
+    assert 1234 in keep and 4321 in keep
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('part, expected', [
+    ('{Total No. of flights} > 500', ('Total No. of flights', 'gt', 500.0)),
+    ('{Total No. of flights} s>= 500', ('Total No. of flights', 'ge', 500.0)),
+    ('{Most used aircraft} = "A320"', ('Most used aircraft', 'eq', 'A320')),
+    ('{Operator} ne "Air"', ('Operator', 'ne', 'Air')),
+    ('{Operator} contains 12', ('Operator', 'contains', '12')),
+    ('{Operator} contains "Air \\"F"', ('Operator', 'contains', 'Air "F')),
+    # Operator words inside the value
+    ('{Operator} contains "Jet Airline Co"', ('Operator', 'contains', 'Jet Airline Co')),
+    ('{Operator} icontains "Orange Air"', ('Operator', 'contains', 'Orange Air')),
+    ('{Operator} = "Castle Air"', ('Operator', 'eq', 'Castle Air')),
+    ('{Operator} eq "Blue <= Red"', ('Operator', 'eq', 'Blue <= Red')),
+    ('no column', (None, None, None)),
+])
+def test_split_filter_part(part, expected):
+    assert app.split_filter_part(part) == expected
+
+
+def test_filter_table():
+    table = pd.DataFrame({
+        'Operator': ['Jet Airline Co', 'Orange Air', 'Castle Air', 'Air France', None],
+        'Total No. of flights': [10, 200, 30, 400, 50],
+        'Most used aircraft': ['A320', 'B737', 'A320', 'A350', None],
+    })
+    def operators(query):
+        return app.filter_table(table, query)['Operator'].tolist()
+
+    assert operators('{Operator} contains "Jet Airline Co"') == ['Jet Airline Co']
+    assert operators('{Operator} contains "Orange Air"') == ['Orange Air']
+    assert operators('{Operator} contains "castle air"') == ['Castle Air']
+    assert operators('{Operator} contains "air" && {Total No. of flights} >= 200') == ['Orange Air', 'Air France']
+    assert operators('{Most used aircraft} = "A320" && {Total No. of flights} < 20') == ['Jet Airline Co']
+    # A number compared with text matches nothing, unknown columns are ignored
+    assert operators('{Operator} > 3') == []
+    assert operators('{Unknown} = 3') == table['Operator'].tolist()
+    assert operators('') == table['Operator'].tolist()
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from dash.exceptions import PreventUpdate
+
+import app
+
+
+def test_refresh_data():
+    data = app.dataset
+    shown = app.published_version(data)
+    rows = shown['rows']
+    # Same data in another worker, whatever its version counter
+    with pytest.raises(PreventUpdate):
+        app.refresh_data(1, dict(shown), data.end_date)
+    # A worker that has not read the newer flights shown yet
+    with pytest.raises(PreventUpdate):
+        app.refresh_data(1, dict(shown, tag='newer', rows=rows + 10), data.end_date)
+
+    older = dict(shown, tag='older', rows=rows - 10, end_date=data.end_date - pd.Timedelta(days=1))
+    version, start, end, picker = app.refresh_data(1, older, older['end_date'])
+    assert version == shown
+    assert picker == data.end_date
+    # The end of the range only follows the data if the user left it there
+    picker = app.refresh_data(1, older, '2019-06-01')[3]
+    assert picker == '2019-06-01'
+
+
+def assert_same(data, expected):
+    # Same info, index, cube and frame as ``expected``
+    assert data.info == expected.info
+    assert data.tag == expected.tag
+    for name, values in expected.index.arrays.items():
+        np.testing.assert_array_equal(data.index.arrays[name], values, err_msg=name)
+    for name in app.FlightCube.arrays:
+        np.testing.assert_array_equal(getattr(data.cube, name), getattr(expected.cube, name), err_msg=name)
+    assert len(data.cube.parts) == len(expected.cube.parts)
+    for p in range(len(expected.cube.parts)):
+        for name, values in expected.cube.partition(p).items():
+            np.testing.assert_array_equal(data.cube.partition(p)[name], values, err_msg='%d %s' % (p, name))
+    assert data.df.equals(expected.df)
+
+
+def split(df, *dates):
+    # The rows before the first date, then between each date and the next,
+    # each piece shuffled as the file may be within a day
+    bounds = [pd.Timestamp.min] + [pd.Timestamp(date) for date in dates] + [pd.Timestamp.max]
+    return [df[(df['Date'] >= lo) & (df['Date'] < hi)].sample(frac=1, random_state=i)
+            for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+def rebuilt(frames):
+    return app.Dataset.from_frame(app.concat_frames(frames), files=['data'])
+
+
+def appended(frames):
+    data = app.Dataset.from_frame(frames[0], files=['data'])
+    for rows in frames[1:]:
+        data = data.append(rows, 0, 0)
+    return data
+
+
+def test_append_extends():
+    # Across month ends, then day by day
+    frames = split(app.dataset.df, '2019-12-20', '2020-01-03', '2020-02-01', '2020-02-02', '2020-02-03')
+    data = app.Dataset.from_frame(frames[0], files=['data'])
+    for rows in frames[1:]:
+        assert data.extends(rows.sort_values('Date', kind='mergesort'))
+        data = data.append(rows, 0, 0)
+    assert data._frames is not None
+    assert_same(data, rebuilt(frames))
+
+
+def test_append_same_day():
+    df = app.dataset.df
+    frames = [df.iloc[:len(df) - 30], df.iloc[len(df) - 30:]]
+    assert frames[0]['Date'].iloc[-1] == frames[1]['Date'].iloc[0]
+    assert_same(appended(frames), rebuilt(frames))
+
+
+def test_append_selection():
+    frames = split(app.dataset.df, '2019-11-15')
+    data, expected = appended(frames), rebuilt(frames)
+    operators = list(expected.operator_options[:5])
+    for filters in [(operators, app.weekdays[:3], '2019-10-01', '2020-01-20'),
+                    ([app.ALL_OPERATORS], app.weekdays, expected.start_date, expected.end_date)]:
+        selection = app.Selection(data.cube, *filters)
+        reference = app.Selection(expected.cube, *filters)
+        assert selection.daily.equals(reference.daily)
+        assert selection.operator_table().equals(reference.operator_table())
+        np.testing.assert_array_equal(data.index.select(*filters), expected.index.select(*filters))
+
+
+def test_append_out_of_order():
+    # Older rows, or a new operator, rebuild everything
+    late, early = split(app.dataset.df, '2019-03-01')[::-1]
+    data = app.Dataset.from_frame(late, files=['data'])
+    assert not data.extends(early.sort_values('Date'))
+    assert_same(data.append(early, 0, 0), rebuilt([late, early]))
+
+    first, rows = split(app.dataset.df, '2020-01-15')
+    rows = rows.assign(Operator=rows['Operator'].cat.add_categories(['New Air']))
+    rows.iloc[0, rows.columns.get_loc('Operator')] = 'New Air'
+    data = app.Dataset.from_frame(first, files=['data'])
+    assert not data.extends(rows.sort_values('Date'))
+    assert_same(data.append(rows, 0, 0), rebuilt([first, rows]))
+
+
+def test_append_store(tmp_path):
+    frames = split(app.dataset.df, '2019-12-20', '2020-01-20')
+    data = app.Dataset.from_frame(frames[0], files=['data'])
+    for i, rows in enumerate(frames[1:]):
+        folder = tmp_path / str(i)
+        folder.mkdir()
+        data.save(str(folder))
+        data = app.Dataset.map(str(folder)).append(rows, 0, 0)
+    folder = tmp_path / 'last'
+    folder.mkdir()
+    data.save(str(folder))
+    # The months the rows did not reach are linked to the previous store
+    links = [os.stat(path).st_nlink for path in folder.glob('cube-0.*.npy')]
+    assert min(links) > 1
+    assert_same(app.Dataset.map(str(folder)), rebuilt(frames))
@@ -0,0 +1,63 @@
+import json
+import time
+
+import plotly.utils
+import pytest
+
+import app
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'JOB_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'JOB_WORKERS', 2)
+    yield
+    app.stop_jobs()
+
+
+def inputs(year=2019):
+    return ([app.ALL_OPERATORS], app.weekdays, year, '2019-01-01', '2020-02-04', 0, 10, (), '')
+
+
+def encode(value):
+    return json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def poll(state, current):
+    # Polls the job of the page until every output is delivered
+    outputs = [None] * app.DASHBOARD_OUTPUTS
+    for _ in range(200):
+        result = app.poll_job('page', state, current)
+        for slot, value in enumerate(result[:app.DASHBOARD_OUTPUTS]):
+            if value is not app.dash.no_update:
+                outputs[slot] = value
+        state = result[app.DASHBOARD_OUTPUTS]
+        if result[-2]:
+            return outputs, state
+        time.sleep(0.05)
+    raise AssertionError('job not done')
+
+
+def test_job_of_another_worker(jobs, monkeypatch):
+    app.render_cache.clear()
+    state = app.job_state(app.start_job('page', inputs()))
+    # This worker forgets the job, as another worker process would not know it
+    app.stop_jobs()
+    monkeypatch.setattr(app, 'compute_dashboard', None)
+    outputs, state = poll(state, inputs())
+    assert sorted(state['delivered']) == sorted(app.JOB_TASKS)
+
+    app.render_cache.clear()
+    for name, slots in app.JOB_TASKS.items():
+        for slot, value in zip(slots, app.run_task(name, *inputs())):
+            assert encode(outputs[slot]) == encode(value)
+
+
+def test_output_not_wanted(jobs):
+    app.render_cache.clear()
+    state = app.job_state(app.start_job('page', inputs(2019)))
+    # The page moved to another year while the job was running
+    outputs, _ = poll(state, inputs(2020))
+    assert outputs[app.JOB_TASKS['week'][0]] is None
+    assert outputs[0] is not None
+
@@ -0,0 +1,52 @@
+from collections import Counter
+
+import pytest
+
+import app
+from benchmark import generate
+
+
+@pytest.fixture(scope='module')
+def data_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp('parse') / 'data-plane.csv'
+    generate(str(path), rows=5000, operators=20, days=60, seed=2)
+    return str(path)
+
+
+def test_chunks_match_one_chunk(data_file, monkeypatch):
+    whole, end = app.read_data(data_file)
+    assert end == len(open(data_file, 'rb').read())
+
+    monkeypatch.setattr(app, 'PARSE_CHUNK_BYTES', 4096)
+    assert len(app.chunk_bounds(data_file, 0)) > 10
+    for workers in (1, 3):
+        monkeypatch.setattr(app, 'PARSE_WORKERS', workers)
+        rows, offset = app.read_data(data_file)
+        assert offset == end
+        assert rows.equals(whole)
+
+
+def test_incomplete_line_left(tmp_path):
+    path = tmp_path / 'data-plane.csv'
+    path.write_bytes(b'1\t2020-01-01\t10\tAirbus\tA320\tAir A\t3\n2\t2020-01-0')
+    rows, offset = app.read_data(str(path))
+    assert len(rows) == 1
+    assert offset == path.read_bytes().index(b'\n') + 1
+    assert app.read_data(str(path), offset) == (None, offset)
+
+
+def test_rejected_lines(tmp_path):
+    path = tmp_path / 'data-plane.csv'
+    path.write_bytes(b''.join([
+        b'1\t2020-01-01\t10\tAirbus\tA320\tAir A\t3\n',
+        b'2\t2020-01-01\t11\tAirbus\tA320\tAir A\t3\textra\n',
+        b'3\t2020-01-02\t12\tBoeing\tB737\tAir B\n',
+        b'\n',
+        b'4\tnot a date\t13\tBoeing\tB737\tAir B\t1\n',
+        b'5\t2020-01-02\t14\tBoeing\tB737\tAir B\t2\n',
+        b'6\t2020-01-02\tNaN\tBoeing\tB737\tAir B\t2\textra\tand more\n',
+    ]))
+    before = Counter(app.rejected_lines)
+    rows, _ = app.read_data(str(path))
+    assert rows['NumberFlights'].tolist() == [3, 2]
+    assert app.rejected_lines - before == Counter({'too many fields': 2, 'too few fields': 1, 'bad date': 1})
@@ -0,0 +1,127 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+def reference(df, operators, days, start_date, end_date):
+    # The rows of a filter state, with plain pandas masks
+    mask = df['DayOfWeek'].isin(days) & df['Date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
+    if app.ALL_OPERATORS not in operators:
+        mask &= df['Operator'].isin(operators)
+    return df[mask]
+
+
+def top_operators(n):
+    return list(app.dataset.operator_options[:n])
+
+
+FILTERS = {
+    'all operators': lambda: ([app.ALL_OPERATORS], app.weekdays, '2019-01-01', '2020-02-04'),
+    'some operators and days': lambda: (top_operators(5), ['Monday', 'Saturday'], '2019-03-10', '2019-11-20'),
+    'no operator': lambda: ([], app.weekdays, '2019-01-01', '2020-02-04'),
+    'unknown operator': lambda: (['No Such Air'], app.weekdays, '2019-01-01', '2020-02-04'),
+    # 2019-12-30 is in the first ISO week of 2020
+    'iso year boundary': lambda: (top_operators(10), app.weekdays, '2019-12-23', '2020-01-12'),
+}
+
+
+@pytest.fixture(params=list(FILTERS))
+def filters(request):
+    return FILTERS[request.param]()
+
+
+def test_selection(filters):
+    selection = app.get_selection(*filters)
+    rows = reference(app.dataset.df, *filters)
+
+    assert selection.nb_rows == len(rows)
+    assert selection.nb_flights == rows['NumberFlights'].sum()
+    assert selection.nb_days == rows['Date'].nunique()
+    assert selection.nb_operators == rows['Operator'].nunique()
+
+    daily = rows.groupby('Date').agg(WeekNumber=('WeekNumber', 'first'),
+                                     DayOfWeek=('DayOfWeek', 'first'),
+                                     NumberFlights=('NumberFlights', 'sum')).reset_index()
+    got = selection.daily
+    assert got['Date'].tolist() == daily['Date'].tolist()
+    assert got['WeekNumber'].tolist() == daily['WeekNumber'].tolist()
+    assert got['DayOfWeek'].tolist() == daily['DayOfWeek'].astype(str).tolist()
+    assert got['NumberFlights'].tolist() == daily['NumberFlights'].tolist()
+
+    table = selection.operator_table()
+    totals = rows.groupby('Operator', observed=True)['NumberFlights'].sum()
+    assert dict(zip(table['Operator'], table['Total No. of flights'])) == totals[totals > 0].to_dict()
+    assert table['Total No. of flights'].is_monotonic_decreasing
+
+
+def test_filter_dataframe(filters):
+    df = app.dataset.df
+    assert app.filter_dataframe(df, *filters).equals(reference(df, *filters))
+
+
+def test_filter_dataframe_unsorted(filters):
+    # Another frame, not sorted by date, keeps its rows and their order
+    df = app.dataset.df.sample(frac=1, random_state=0)
+    assert app.filter_dataframe(df, *filters).equals(reference(df, *filters))
+
+
+def test_iso_week_boundary():
+    selection = app.get_selection(*FILTERS['iso year boundary']())
+    weeks = selection.daily.set_index('Date')[['ISOYear', 'WeekNumber']]
+    assert tuple(weeks.loc[pd.Timestamp('2019-12-29')]) == (2019, 52)
+    assert tuple(weeks.loc[pd.Timestamp('2019-12-30')]) == (2020, 1)
+    assert tuple(weeks.loc[pd.Timestamp('2020-01-05')]) == (2020, 1)
+    assert tuple(weeks.loc[pd.Timestamp('2020-01-06')]) == (2020, 2)
+
+
+def values(array):
+    # Plotly may encode the arrays of a figure as base64 typed arrays
+    if isinstance(array, dict):
+        return np.frombuffer(base64.b64decode(array['bdata']), dtype=array['dtype']).tolist()
+    return list(array)
+
+
+def week_bars(figure):
+    # Flights of each week of the figure, summed over the period traces
+    bars = {}
+    for trace in figure['data']:
+        for week, flights in zip(values(trace['x']), values(trace['y'])):
+            bars[week] = bars.get(week, 0) + flights
+    return bars
+
+
+@pytest.mark.parametrize('year', [2019, 2020])
+def test_week_figure(year):
+    operators, days, start_date, end_date = FILTERS['all operators']()
+    rows = reference(app.dataset.df, operators, days, start_date, end_date)
+    iso = rows['Date'].dt.isocalendar()
+    expected = rows[iso.year == year].groupby(iso.week[iso.year == year])['NumberFlights'].sum()
+
+    figure = app.make_week_figure(operators, days, year, start_date, end_date)
+    assert week_bars(figure) == expected.to_dict()
+    weekly = app.api_weekly(app.get_selection(operators, days, start_date, end_date), year)
+    assert weekly.groupby('WeekNumber')['NumberFlights'].sum().to_dict() == expected.to_dict()
+    assert (weekly['Year'] == year).all()
+
+
+def test_means(filters):
+    selection = app.get_selection(*filters)
+    rows = reference(app.dataset.df, *filters)
+    daily = rows.groupby('Date')['NumberFlights'].sum()
+    days = rows.groupby('Date')['DayOfWeek'].first().astype(str)
+
+    # Means over the dates, of the flights of each date at that hour or on that day
+    hourly = rows.dropna(subset=['Hour']).groupby(['Date', 'Hour'])['NumberFlights'].sum()
+    hour_means = hourly.groupby(level='Hour').mean()
+    got = selection.hour_means()
+    assert got['Hour'].tolist() == hour_means.index.astype(float).tolist()
+    np.testing.assert_allclose(got['NumberFlights'], hour_means.values)
+
+    day_means = daily.groupby(days).mean()
+    got = selection.dayofweek_means()
+    assert got['DayOfWeek'].tolist() == [day for day in app.weekdays if day in day_means.index]
+    np.testing.assert_allclose(got['NumberFlights'], day_means[got['DayOfWeek']].values)